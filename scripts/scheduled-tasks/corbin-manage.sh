@@ -8,6 +8,9 @@ set -e
 SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 WORKING_DIR="$(dirname "$SCRIPT_DIR")"
 MEMORY_FILE="$WORKING_DIR/memory/memory_index.json"
+memory_store() {
+    python3 "$SCRIPT_DIR/../utilities/memory_store.py" --json "$MEMORY_FILE" "$@"
+}
 
 cd "$WORKING_DIR" || exit 1
 
@@ -39,8 +42,7 @@ case "$command" in
             exit 1
         fi
 
-        jq ".custom_memory.scheduled_tasks.\"${task_name}\".enabled = true" "$MEMORY_FILE" > tmp.json && \
-            mv tmp.json "$MEMORY_FILE"
+        memory_store set "custom_memory.scheduled_tasks.${task_name}.enabled=true"
         echo "✓ Task '$task_name' enabled"
         ;;
 
@@ -50,8 +52,7 @@ case "$command" in
             exit 1
         fi
 
-        jq ".custom_memory.scheduled_tasks.\"${task_name}\".enabled = false" "$MEMORY_FILE" > tmp.json && \
-            mv tmp.json "$MEMORY_FILE"
+        memory_store set "custom_memory.scheduled_tasks.${task_name}.enabled=false"
         echo "✓ Task '$task_name' disabled"
         ;;
 
@@ -22,6 +22,11 @@ mkdir -p "$NOTIFICATIONS_DIR" "$LOG_DIR"
 LOG_FILE="$LOG_DIR/${TASK_NAME}_${TIMESTAMP}.log"
 NOTIFICATION_FILE="$NOTIFICATIONS_DIR/${TASK_NAME}_${TIMESTAMP}.md"
 
+# Memory store: indexed, lock-protected access to memory/memory_index.json
+memory_store() {
+    python3 "$SCRIPT_DIR/../utilities/memory_store.py" --json memory/memory_index.json "$@"
+}
+
 # Change to working directory
 cd "$WORKING_DIR" || exit 1
 
@@ -33,12 +38,12 @@ echo "" | tee -a "$LOG_FILE"
 
 # Get task configuration from memory
 echo "Reading task configuration..." | tee -a "$LOG_FILE"
-TASK_CONFIG=$(jq -r ".custom_memory.scheduled_tasks.\"${TASK_NAME}\"" memory/memory_index.json 2>/dev/null)
+TASK_CONFIG=$(memory_store get "custom_memory.scheduled_tasks.${TASK_NAME}" 2>/dev/null)
 
 if [ "$TASK_CONFIG" = "null" ] || [ -z "$TASK_CONFIG" ]; then
     echo "ERROR: Task '${TASK_NAME}' not found in memory/memory_index.json" | tee -a "$LOG_FILE"
     echo "Available tasks:" | tee -a "$LOG_FILE"
-    jq -r '.custom_memory.scheduled_tasks | keys[]' memory/memory_index.json 2>/dev/null | tee -a "$LOG_FILE"
+    memory_store keys custom_memory.scheduled_tasks 2>/dev/null | tee -a "$LOG_FILE"
     exit 1
 fi
 
@@ -132,13 +137,13 @@ ${RESULT}
 EOF
     fi
 
-    # Update last_run timestamp in memory
+    # Update last_run timestamp in memory (locked partial update, then JSON export)
     echo "Updating memory with execution timestamp..." | tee -a "$LOG_FILE"
-    jq ".custom_memory.scheduled_tasks.\"${TASK_NAME}\".last_run = \"${ISO_TIMESTAMP}\" | \
-        .custom_memory.scheduled_tasks.\"${TASK_NAME}\".last_status = \"success\" | \
-        .custom_memory.scheduled_tasks.\"${TASK_NAME}\".last_cost_usd = ${COST}" \
-        memory/memory_index.json > memory/memory_index.json.tmp && \
-        mv memory/memory_index.json.tmp memory/memory_index.json
+    [[ "$COST" =~ ^[0-9.]+$ ]] || COST=null
+    memory_store set \
+        "custom_memory.scheduled_tasks.${TASK_NAME}.last_run=\"${ISO_TIMESTAMP}\"" \
+        "custom_memory.scheduled_tasks.${TASK_NAME}.last_status=\"success\"" \
+        "custom_memory.scheduled_tasks.${TASK_NAME}.last_cost_usd=${COST}"
 
 else
     echo "ERROR: Task failed with exit code $EXIT_CODE" | tee -a "$LOG_FILE"
@@ -160,10 +165,9 @@ See log file: ${LOG_FILE}
 EOF
 
     # Update memory with failure
-    jq ".custom_memory.scheduled_tasks.\"${TASK_NAME}\".last_run = \"${ISO_TIMESTAMP}\" | \
-        .custom_memory.scheduled_tasks.\"${TASK_NAME}\".last_status = \"failed\"" \
-        memory/memory_index.json > memory/memory_index.json.tmp && \
-        mv memory/memory_index.json.tmp memory/memory_index.json
+    memory_store set \
+        "custom_memory.scheduled_tasks.${TASK_NAME}.last_run=\"${ISO_TIMESTAMP}\"" \
+        "custom_memory.scheduled_tasks.${TASK_NAME}.last_status=\"failed\""
 fi
 
 echo "" | tee -a "$LOG_FILE"
@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+Fake Gmail API for benchmarking extract_agent_hub_recipients.py
+
+Serves a minimal Gmail v1 discovery document (pointing back at this server),
+users.getProfile, messages.list/get, history.list and the multipart batch
+endpoint, over N synthetic Agent Hub delivery emails. Point the extractor at
+it with --discovery-url http://HOST:PORT/discovery/gmail/v1.
+"""
+
+import argparse
+import base64
+import json
+import random
+import re
+import time
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+SUBJECT = 'Your agent from Ability AI Agent Hub'
+FIRST_HISTORY_ID = 1000
+LIST_MAX_RESULTS = 500
+HISTORY_PAGE_SIZE = 500
+
+NAMES = [
+    'Alvin Wu', 'Lucas', 'Janaka Bandara', 'sanjai', 'blaise corod', 'mike',
+    'parth', 'Ajisa', 'YC', 'matheus sangrento', 'lrupp', 'sanggeun',
+]
+WORKFLOWS = [
+    'AI News Summarizer & Keyword Extractor Agent',
+    'AI SMS Chat Agent with Smart Reply Debouncer (OpenAI & Twilio)',
+    'AI Document Q&amp;A Agent with n8n, OpenAI & Qdrant',
+    'AI-Powered GitLab Merge Request Code Reviewer',
+    'AI Telegram Image Generation Agent',
+    'AI Agent: Chat with Your PostgreSQL Database',
+]
+
+HTML_TEMPLATE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Ability AI Agent Hub</title></head>
+<body style="font-family: Arial, sans-serif">
+<table width="100%" cellpadding="0" cellspacing="0"><tr><td>
+<p>Hi {name},</p>
+<p>Thanks for grabbing <strong>{workflow}</strong>. It's attached to this email
+as a JSON file you can import straight into n8n.</p>
+<p>Reply to this email if you get stuck - a human reads every reply.</p>
+{filler}
+</td></tr></table>
+</body></html>
+"""
+
+RAW_TEMPLATE = """From: Agent Hub <hub@example.com>
+To: user{index}@example.com
+Subject: {subject}
+Message-ID: <{message_id}@example.com>
+MIME-Version: 1.0
+Content-Type: multipart/mixed; boundary="mixed-{message_id}"
+
+--mixed-{message_id}
+Content-Type: multipart/alternative; boundary="alt-{message_id}"
+
+--alt-{message_id}
+Content-Type: text/plain; charset="utf-8"
+
+Hi {name}, your agent is attached.
+
+--alt-{message_id}
+Content-Type: text/html; charset="utf-8"
+
+{html}
+--alt-{message_id}--
+
+--mixed-{message_id}
+Content-Type: application/json; name="workflow.json"
+Content-Disposition: attachment; filename="workflow.json"
+Content-Transfer-Encoding: base64
+
+{attachment}
+--mixed-{message_id}--
+"""
+
+
+def message_id(index):
+    return f'{index + 1:016x}'
+
+
+def message_index(msg_id):
+    return int(msg_id, 16) - 1
+
+
+def discovery_document(root_url):
+    """Just enough of the Gmail v1 discovery document for googleapiclient"""
+    user_id = {'type': 'string', 'location': 'path', 'required': True}
+
+    def method(name, path, parameters, order, response):
+        # Without a response schema googleapiclient returns raw bytes
+        return {
+            'id': f'gmail.users.{name}',
+            'path': path,
+            'flatPath': path,
+            'httpMethod': 'GET',
+            'parameters': parameters,
+            'parameterOrder': order,
+            'response': {'$ref': response},
+        }
+
+    return {
+        'kind': 'discovery#restDescription',
+        'discoveryVersion': 'v1',
+        'id': 'gmail:v1',
+        'name': 'gmail',
+        'version': 'v1',
+        'title': 'Fake Gmail API',
+        'protocol': 'rest',
+        'rootUrl': root_url,
+        'servicePath': '',
+        'baseUrl': root_url,
+        'batchPath': 'batch/gmail/v1',
+        'parameters': {
+            'alt': {'type': 'string', 'location': 'query', 'default': 'json'},
+            'fields': {'type': 'string', 'location': 'query'},
+        },
+        'schemas': {
+            name: {'id': name, 'type': 'object'}
+            for name in ('Profile', 'ListMessagesResponse', 'Message', 'ListHistoryResponse')
+        },
+        'resources': {
+            'users': {
+                'methods': {
+                    'getProfile': method(
+                        'getProfile', 'gmail/v1/users/{userId}/profile',
+                        {'userId': user_id}, ['userId'], 'Profile'
+                    ),
+                },
+                'resources': {
+                    'messages': {'methods': {
+                        'list': method('messages.list', 'gmail/v1/users/{userId}/messages', {
+                            'userId': user_id,
+                            'q': {'type': 'string', 'location': 'query'},
+                            'maxResults': {'type': 'integer', 'location': 'query'},
+                            'pageToken': {'type': 'string', 'location': 'query'},
+                        }, ['userId'], 'ListMessagesResponse'),
+                        'get': method('messages.get', 'gmail/v1/users/{userId}/messages/{id}', {
+                            'userId': user_id,
+                            'id': {'type': 'string', 'location': 'path', 'required': True},
+                            'format': {'type': 'string', 'location': 'query'},
+                            'metadataHeaders': {'type': 'string', 'location': 'query',
+                                                'repeated': True},
+                        }, ['userId', 'id'], 'Message'),
+                    }},
+                    'history': {'methods': {
+                        'list': method('history.list', 'gmail/v1/users/{userId}/history', {
+                            'userId': user_id,
+                            'startHistoryId': {'type': 'string', 'location': 'query'},
+                            'historyTypes': {'type': 'string', 'location': 'query',
+                                             'repeated': True},
+                            'labelId': {'type': 'string', 'location': 'query'},
+                            'pageToken': {'type': 'string', 'location': 'query'},
+                        }, ['userId'], 'ListHistoryResponse'),
+                    }},
+                },
+            },
+        },
+    }
+
+
+class Mailbox:
+    """N deterministic delivery emails; message i has historyId FIRST_HISTORY_ID + i"""
+
+    def __init__(self, count, attachment_kb=4, filler_kb=2):
+        self.count = count
+        rng = random.Random(0)
+        self._attachment = base64.encodebytes(rng.randbytes(attachment_kb * 1024)).decode()
+        self._filler = '<p>' + 'Lorem ipsum dolor sit amet. ' * (filler_kb * 1024 // 28) + '</p>'
+
+    def history_id(self):
+        """The mailbox's current historyId: that of the newest message"""
+        return FIRST_HISTORY_ID + self.count - 1
+
+    def exists(self, msg_id):
+        try:
+            return 0 <= message_index(msg_id) < self.count
+        except ValueError:
+            return False
+
+    def raw(self, index):
+        name = NAMES[index % len(NAMES)]
+        html = HTML_TEMPLATE.format(
+            name=name, workflow=WORKFLOWS[index % len(WORKFLOWS)], filler=self._filler
+        )
+        rfc822 = RAW_TEMPLATE.format(
+            index=index, subject=SUBJECT, message_id=message_id(index), name=name,
+            html=html, attachment=self._attachment
+        ).replace('\n', '\r\n')
+        return base64.urlsafe_b64encode(rfc822.encode('utf-8')).decode('ascii')
+
+    def message(self, msg_id, fmt):
+        index = message_index(msg_id)
+        body = {
+            'id': msg_id,
+            'threadId': msg_id,
+            'labelIds': ['SENT'],
+            'historyId': str(FIRST_HISTORY_ID + index),
+        }
+        if fmt == 'raw':
+            body['raw'] = self.raw(index)
+        else:
+            body['payload'] = {
+                'mimeType': 'multipart/mixed',
+                'headers': [{'name': 'Subject', 'value': SUBJECT}],
+            }
+        return body
+
+    def page(self, start, size):
+        end = min(start + size, self.count)
+        return [message_id(i) for i in range(start, end)], (end if end < self.count else None)
+
+
+class FakeGmailHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    # Request routing, shared by plain and batched calls
+
+    def route(self, method, target):
+        """Return (status, JSON body) for one API call"""
+        mailbox = self.server.mailbox
+        parts = urlsplit(target)
+        query = parse_qs(parts.query)
+        path = unquote(parts.path)
+
+        if method == 'GET' and path.startswith('/discovery/'):
+            host = self.headers.get('Host', '%s:%d' % self.server.server_address)
+            return 200, discovery_document(f'http://{host}/')
+        if method != 'GET':
+            return 405, {'error': {'code': 405, 'message': 'Method not allowed'}}
+
+        if path == '/gmail/v1/users/me/profile':
+            return 200, {'emailAddress': 'me@example.com',
+                         'messagesTotal': mailbox.count,
+                         'historyId': str(mailbox.history_id())}
+
+        if path == '/gmail/v1/users/me/messages':
+            size = min(int(query.get('maxResults', ['100'])[0]), LIST_MAX_RESULTS)
+            ids, next_start = mailbox.page(int(query.get('pageToken', ['0'])[0]), size)
+            body = {'messages': [{'id': i, 'threadId': i} for i in ids],
+                    'resultSizeEstimate': mailbox.count}
+            if next_start is not None:
+                body['nextPageToken'] = str(next_start)
+            return 200, body
+
+        match = re.fullmatch(r'/gmail/v1/users/me/messages/([^/]+)', path)
+        if match:
+            if not mailbox.exists(match.group(1)):
+                return 404, {'error': {'code': 404, 'message': 'Requested entity was not found.'}}
+            if random.random() < self.server.error_rate:
+                return 429, {'error': {'code': 429, 'message': 'Too many concurrent requests for user'}}
+            return 200, mailbox.message(match.group(1), query.get('format', ['full'])[0])
+
+        if path == '/gmail/v1/users/me/history':
+            start_history = int(query['startHistoryId'][0])
+            # Anything older than the empty mailbox's position has expired
+            if start_history < FIRST_HISTORY_ID - 1:
+                return 404, {'error': {'code': 404, 'message': 'Requested entity was not found.'}}
+            first = start_history - FIRST_HISTORY_ID + 1
+            ids, next_start = mailbox.page(
+                int(query.get('pageToken', [first])[0]), HISTORY_PAGE_SIZE
+            )
+            body = {'history': [{'id': str(message_index(i) + FIRST_HISTORY_ID),
+                                 'messagesAdded': [{'message': {'id': i, 'threadId': i}}]}
+                                for i in ids],
+                    'historyId': str(mailbox.history_id())}
+            if next_start is not None:
+                body['nextPageToken'] = str(next_start)
+            return 200, body
+
+        return 404, {'error': {'code': 404, 'message': f'No route for {path}'}}
+
+    def delay(self):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+    def send_body(self, status, body, content_type='application/json; charset=UTF-8'):
+        if isinstance(body, dict):
+            body = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self.delay()
+        self.send_body(*self.route('GET', self.path))
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length)
+        if urlsplit(self.path).path != '/batch/gmail/v1':
+            self.send_body(404, {'error': {'code': 404, 'message': 'Not found'}})
+            return
+        self.delay()
+        self.batch(body)
+
+    def batch(self, body):
+        """Answer a multipart/mixed batch of application/http parts"""
+        envelope = BytesParser().parsebytes(
+            b'Content-Type: ' + self.headers['Content-Type'].encode() + b'\r\n\r\n' + body
+        )
+        boundary = f'batch_{random.getrandbits(64):016x}'
+        out = []
+        for part in envelope.get_payload():
+            request_line = part.get_payload().lstrip().split('\n', 1)[0].strip()
+            method, target, _ = request_line.split(' ', 2)
+            status, result = self.route(method, target)
+            payload = json.dumps(result)
+            # Unfold the header; the client matches replies on '<response-' + its ID
+            content_id = ' '.join(part['Content-ID'].split()).replace('<', '<response-', 1)
+            out.append(
+                f'--{boundary}\r\n'
+                'Content-Type: application/http\r\n'
+                f'Content-ID: {content_id}\r\n\r\n'
+                f'HTTP/1.1 {status} {self.responses[status][0]}\r\n'
+                'Content-Type: application/json; charset=UTF-8\r\n'
+                f'Content-Length: {len(payload)}\r\n\r\n'
+                f'{payload}\r\n'
+            )
+        out.append(f'--{boundary}--\r\n')
+        self.send_body(200, ''.join(out).encode('utf-8'),
+                       f'multipart/mixed; boundary={boundary}')
+
+
+def make_server(count, host='127.0.0.1', port=0, latency_ms=0.0, error_rate=0.0,
+                attachment_kb=4):
+    """Build (but do not start) a fake Gmail server; port 0 picks a free port"""
+    server = ThreadingHTTPServer((host, port), FakeGmailHandler)
+    server.daemon_threads = True
+    server.mailbox = Mailbox(count, attachment_kb=attachment_kb)
+    server.latency = latency_ms / 1000
+    server.error_rate = error_rate
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fake Gmail API for benchmarks')
+    parser.add_argument('-n', '--messages', type=int, default=1000,
+                        help='Number of synthetic delivery emails (default: 1000)')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--latency-ms', type=float, default=0.0,
+                        help='Delay added to every HTTP request, batch or not')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='Fraction of messages.get calls answered with 429')
+    parser.add_argument('--attachment-kb', type=int, default=4,
+                        help='Size of the attachment in each raw message')
+    args = parser.parse_args()
+
+    server = make_server(args.messages, args.host, args.port, args.latency_ms,
+                         args.error_rate, args.attachment_kb)
+    host, port = server.server_address
+    print(f"Fake Gmail with {args.messages} messages: "
+          f"--discovery-url http://{host}:{port}/discovery/gmail/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
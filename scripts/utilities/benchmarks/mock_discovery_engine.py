@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Mock Discovery Engine (Vertex AI Search) endpoint for benchmarking
+search_call_transcripts.py
+
+Answers any POST to a ...:search path with deterministic results, paginated
+like the real API, after a configurable delay. Point the search script at it
+with --endpoint http://HOST:PORT --token-source file.
+"""
+
+import argparse
+import json
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_TOTAL_RESULTS = 57
+# The real API caps pageSize at 100; a lower cap exercises pagination
+DEFAULT_MAX_PAGE_SIZE = 25
+
+
+def search_response(query, page_size, start, total, max_page_size):
+    end = min(start + min(page_size, max_page_size), total)
+    response = {
+        'totalSize': total,
+        'attributionToken': 'mock',
+        'results': [
+            {
+                'id': f'doc-{i}',
+                'document': {
+                    'id': f'doc-{i}',
+                    'derivedStructData': {
+                        'title': f'Call transcript {i}: {query}',
+                        'owner': 'me@example.com',
+                        'link': f'https://drive.google.com/file/d/doc-{i}',
+                        'extractive_answers': [{
+                            'content': f'... we talked about <b>{query}</b> at length ...',
+                            'pageNumber': '1',
+                        }],
+                        'snippets': [{
+                            'snippet': f'Discussion of <b>{query}</b> and next steps',
+                            'snippet_status': 'SUCCESS',
+                        }],
+                    },
+                },
+            }
+            for i in range(start, end)
+        ],
+    }
+    if end < total:
+        response['nextPageToken'] = str(end)
+    return response
+
+
+class MockDiscoveryEngineHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=UTF-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+        server = self.server
+        delay = server.latency
+        if server.jitter:
+            delay += random.expovariate(1 / server.jitter)
+        if delay:
+            time.sleep(delay)
+
+        if not self.path.endswith(':search'):
+            self.send_json(404, {'error': {'code': 404, 'message': 'Not found'}})
+        elif not self.headers.get('Authorization', '').startswith('Bearer '):
+            self.send_json(401, {'error': {'code': 401, 'message': 'Missing bearer token'}})
+        elif random.random() < server.error_rate:
+            self.send_json(503, {'error': {'code': 503, 'message': 'Service unavailable'}})
+        else:
+            self.send_json(200, search_response(
+                payload['query'], payload.get('pageSize', 10),
+                int(payload.get('pageToken') or 0),
+                server.total_results, server.max_page_size
+            ))
+
+
+def make_server(host='127.0.0.1', port=0, latency_ms=0.0, jitter_ms=0.0,
+                error_rate=0.0, total_results=DEFAULT_TOTAL_RESULTS,
+                max_page_size=DEFAULT_MAX_PAGE_SIZE):
+    """Build (but do not start) a mock server; port 0 picks a free port"""
+    server = ThreadingHTTPServer((host, port), MockDiscoveryEngineHandler)
+    server.daemon_threads = True
+    server.latency = latency_ms / 1000
+    server.jitter = jitter_ms / 1000
+    server.error_rate = error_rate
+    server.total_results = total_results
+    server.max_page_size = max_page_size
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mock Discovery Engine for benchmarks')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', type=float, default=20.0,
+                        help='Fixed delay per request (default: 20)')
+    parser.add_argument('--jitter-ms', type=float, default=0.0,
+                        help='Mean of an exponentially distributed extra delay, for a long tail')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='Fraction of requests answered with 503')
+    parser.add_argument('--total-results', type=int, default=DEFAULT_TOTAL_RESULTS)
+    parser.add_argument('--max-page-size', type=int, default=DEFAULT_MAX_PAGE_SIZE)
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.latency_ms, args.jitter_ms,
+                         args.error_rate, args.total_results, args.max_page_size)
+    host, port = server.server_address
+    print(f"Mock Discovery Engine: --endpoint http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Benchmark the utility scripts against local stand-ins for their APIs
+
+Runs extract_agent_hub_recipients.py against fake_gmail.py and
+search_call_transcripts.py --batch against mock_discovery_engine.py at each
+size, collecting throughput, tail latency and peak memory from the scripts'
+own --profile reports, then compares them with a stored baseline.
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List
+
+BENCH_DIR = Path(__file__).resolve().parent
+UTILITIES_DIR = BENCH_DIR.parent
+sys.path.insert(0, str(BENCH_DIR))
+
+import fake_gmail
+import mock_discovery_engine
+
+DEFAULT_SIZES = [100, 10000, 100000]
+DEFAULT_BASELINE = BENCH_DIR / 'baseline.json'
+# Relative change tolerated before a metric counts as a regression
+DEFAULT_THRESHOLD = 0.25
+# Metrics compared against the baseline; throughput should rise, the rest fall
+COMPARED = ('throughput', 'p95_ms', 'p99_ms', 'peak_rss_mb')
+HIGHER_IS_BETTER = {'throughput'}
+TOPICS = [
+    'pricing', 'onboarding', 'n8n workflow', 'contract renewal', 'API limits',
+    'Gemini', 'HubSpot', 'PostgreSQL agent', 'budget', 'timeline',
+]
+
+
+def serve(server):
+    """Start a server on a daemon thread; return its base URL"""
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address
+    return f'http://{host}:{port}'
+
+
+def run_profiled(command: List[str], workdir: Path) -> Dict:
+    """Run a script with --profile; return its report plus wall time"""
+    profile = workdir / 'profile.json'
+    command = command + ['--profile', str(profile)]
+    started = time.perf_counter()
+    result = subprocess.run(
+        command, cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+        text=True
+    )
+    wall = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(
+            f"{Path(command[1]).name} exited with {result.returncode}:\n"
+            f"{result.stderr[-2000:]}"
+        )
+    with open(profile) as f:
+        report = json.load(f)
+    report['wall_s'] = wall
+    return report
+
+
+def summarize(report: Dict, items: int, latency_span: str) -> Dict:
+    span = report['spans'].get(latency_span, {})
+    return {
+        'items': items,
+        'wall_s': round(report['wall_s'], 3),
+        'throughput': round(items / report['wall_s'], 1),
+        'latency_span': latency_span,
+        'p50_ms': span.get('p50_ms', 0.0),
+        'p95_ms': span.get('p95_ms', 0.0),
+        'p99_ms': span.get('p99_ms', 0.0),
+        'peak_rss_mb': report['peak_rss_mb'],
+        'stages_ms': {name: s['total_ms'] for name, s in report['spans'].items()},
+        'counters': report['counters'],
+    }
+
+
+def bench_gmail(size: int, args) -> Dict:
+    server = fake_gmail.make_server(size, latency_ms=args.gmail_latency_ms)
+    url = serve(server)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            report = run_profiled([
+                sys.executable, str(UTILITIES_DIR / 'extract_agent_hub_recipients.py'),
+                '--discovery-url', f'{url}/discovery/gmail/v1',
+                '--no-cache',
+                '--batch-size', str(args.batch_size),
+                '--workers', str(args.workers),
+            ], Path(tmp))
+    finally:
+        server.shutdown()
+        server.server_close()
+    return summarize(report, size, 'gmail.batch')
+
+
+def bench_search(size: int, args) -> Dict:
+    server = mock_discovery_engine.make_server(
+        latency_ms=args.search_latency_ms, jitter_ms=args.search_jitter_ms
+    )
+    url = serve(server)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            workdir = Path(tmp)
+            (workdir / 'token').write_text('benchmark-token\n')
+            with open(workdir / 'queries.txt', 'w') as f:
+                for i in range(size):
+                    f.write(f'{TOPICS[i % len(TOPICS)]} {i}\n')
+            report = run_profiled([
+                sys.executable, str(UTILITIES_DIR / 'search_call_transcripts.py'),
+                '--batch', str(workdir / 'queries.txt'),
+                '--backend', 'vertex',
+                '--no-cache',
+                '--endpoint', url,
+                '--token-source', 'file',
+                '--token-file', str(workdir / 'token'),
+                '--concurrency', str(args.concurrency),
+            ], workdir)
+    finally:
+        server.shutdown()
+        server.server_close()
+    return summarize(report, size, 'search')
+
+
+SUITES = {
+    'gmail': bench_gmail,
+    'search': bench_search,
+}
+
+
+def settings(args) -> Dict:
+    return {
+        'gmail_latency_ms': args.gmail_latency_ms,
+        'batch_size': args.batch_size,
+        'workers': args.workers,
+        'search_latency_ms': args.search_latency_ms,
+        'search_jitter_ms': args.search_jitter_ms,
+        'concurrency': args.concurrency,
+    }
+
+
+def compare(results: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """Print each compared metric against the baseline; return the regressions"""
+    regressions = []
+    print(f"\n{'scenario':<14} {'metric':<12} {'baseline':>10} {'current':>10} {'change':>8}")
+    for scenario, current in results.items():
+        previous = baseline.get(scenario)
+        if previous is None:
+            print(f"{scenario:<14} (not in baseline)")
+            continue
+        for metric in COMPARED:
+            old, new = previous.get(metric), current.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = -change if metric in HIGHER_IS_BETTER else change
+            flag = ''
+            if worse > threshold:
+                flag = '  REGRESSION'
+                regressions.append(f"{scenario} {metric}: {old} -> {new} ({change:+.0%})")
+            print(f"{scenario:<14} {metric:<12} {old:>10} {new:>10} {change:>+8.0%}{flag}")
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Benchmark the utility scripts against local API stand-ins'
+    )
+    parser.add_argument(
+        '--suite',
+        choices=['all'] + list(SUITES),
+        default='all',
+        help='Which benchmarks to run (default: all)'
+    )
+    parser.add_argument(
+        '--sizes',
+        default=','.join(str(s) for s in DEFAULT_SIZES),
+        help='Comma-separated message/query counts (default: 100,10000,100000)'
+    )
+    parser.add_argument(
+        '--baseline',
+        default=str(DEFAULT_BASELINE),
+        help='Baseline results to compare against (default: benchmarks/baseline.json)'
+    )
+    parser.add_argument(
+        '--save-baseline',
+        action='store_true',
+        help='Merge this run into the baseline file instead of comparing'
+    )
+    parser.add_argument(
+        '--threshold',
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help=f'Relative change that counts as a regression (default: {DEFAULT_THRESHOLD})'
+    )
+    parser.add_argument(
+        '-o', '--output',
+        help='Also write this run\'s full results to a JSON file'
+    )
+    parser.add_argument('--gmail-latency-ms', type=float, default=5.0,
+                        help='Fake Gmail delay per HTTP request (default: 5)')
+    parser.add_argument('--batch-size', type=int, default=50)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--search-latency-ms', type=float, default=5.0,
+                        help='Mock Discovery Engine delay per request (default: 5)')
+    parser.add_argument('--search-jitter-ms', type=float, default=2.0,
+                        help='Mean extra exponential delay per request (default: 2)')
+    parser.add_argument('--concurrency', type=int, default=16,
+                        help='Concurrent queries in the search benchmark (default: 16)')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    sizes = [int(s) for s in args.sizes.split(',') if s]
+    suites = list(SUITES) if args.suite == 'all' else [args.suite]
+    if 'gmail' in suites and importlib.util.find_spec('googleapiclient') is None:
+        print("Skipping gmail: google-api-python-client is not installed", file=sys.stderr)
+        suites.remove('gmail')
+
+    results = {}
+    for suite in suites:
+        for size in sizes:
+            scenario = f'{suite}-{size}'
+            print(f"Running {scenario}...", file=sys.stderr, flush=True)
+            result = results[scenario] = SUITES[suite](size, args)
+            print(
+                f"  {result['throughput']:.1f}/s, {result['latency_span']} "
+                f"p50 {result['p50_ms']:.1f}ms p95 {result['p95_ms']:.1f}ms "
+                f"p99 {result['p99_ms']:.1f}ms, peak RSS {result['peak_rss_mb']:.1f}MB",
+                file=sys.stderr, flush=True
+            )
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'settings': settings(args), 'results': results}, f, indent=2)
+            f.write('\n')
+
+    baseline_path = Path(args.baseline)
+    baseline = {'settings': {}, 'results': {}}
+    if baseline_path.exists():
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+
+    if args.save_baseline:
+        baseline = {
+            'machine': f"{platform.system()} {platform.machine()}, "
+                       f"Python {platform.python_version()}, {os.cpu_count()} CPUs",
+            'settings': settings(args),
+            'results': dict(baseline['results'], **{
+                name: {metric: r[metric] for metric in ('items',) + COMPARED}
+                for name, r in results.items()
+            }),
+        }
+        with open(baseline_path, 'w') as f:
+            json.dump(baseline, f, indent=2)
+            f.write('\n')
+        print(f"\nBaseline updated: {baseline_path}")
+        return
+
+    if not baseline['results']:
+        print(f"\nNo baseline at {baseline_path}; record one with --save-baseline")
+        return
+    if baseline['settings'] != settings(args):
+        print("\nWarning: baseline was recorded with different settings: "
+              f"{baseline['settings']}")
+    regressions = compare(results, baseline['results'], args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    print("\nNo regressions")
+
+
+if __name__ == '__main__':
+    main()
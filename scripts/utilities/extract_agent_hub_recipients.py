@@ -10,17 +10,46 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 from google.oauth2.credentials import Credentials
 from googleapiclient.discovery import build
 from google.auth.transport.requests import Request
+import argparse
 import pickle
 import json
 import re
-import time
 from pathlib import Path
 
+from gmail_checkpoint import CheckpointStore
+from gmail_fetch import (
+    BatchFetcher, DEFAULT_BATCH_SIZE, DEFAULT_WORKERS, HistoryExpired,
+    HistoryReader, iter_message_ids
+)
+from message_cache import DEFAULT_MAX_BYTES, MessageCache, html_from_raw
+from metrics import metrics
+
 SCOPES = ['https://www.googleapis.com/auth/gmail.readonly']
 TOKEN_PATH = Path.home() / '.config' / 'mcp' / 'google-workspace' / 'token.pickle'
+SUBJECT = 'Ability AI Agent Hub'
+QUERY = f'from:me subject:"{SUBJECT}" after:2024-01-01'
+OUTPUT_JSONL = 'agent_hub_recipients.jsonl'
+OUTPUT_JSON = 'agent_hub_recipients.json'
+CHECKPOINT_PATH = 'agent_hub_checkpoint.sqlite'
+CACHE_PATH = 'agent_hub_cache.sqlite'
+# IDs looked up in the cache per round; misses in a window are fetched together
+CACHE_WINDOW = 1000
+
+def get_gmail_service(discovery_url=None):
+    """Get authenticated Gmail service.
+
+    If ``discovery_url`` is given, the service is built unauthenticated from
+    that discovery document instead (e.g. a local fake Gmail endpoint).
+    """
+    if discovery_url:
+        import httplib2
+        return build(
+            'gmail', 'v1',
+            discoveryServiceUrl=discovery_url,
+            http=httplib2.Http(),
+            static_discovery=False
+        )
 
-def get_gmail_service():
-    """Get authenticated Gmail service."""
     creds = None
     if TOKEN_PATH.exists():
         with open(TOKEN_PATH, 'rb') as token:
@@ -49,76 +78,343 @@ def extract_workflow_name(html_content):
         return match.group(1).strip()
     return None
 
-def main():
-    service = get_gmail_service()
-    
-    # Search for agent delivery emails
-    query = 'from:me subject:"Ability AI Agent Hub" after:2024-01-01'
-    results = service.users().messages().list(
-        userId='me',
-        q=query,
-        maxResults=100
-    ).execute()
-    
-    messages = results.get('messages', [])
-    print(f"Found {len(messages)} agent delivery emails\n")
-    
-    recipients = []
+def get_header(message, name):
+    """Return the first header called ``name`` from a message payload."""
+    for header in message['payload'].get('headers', []):
+        if header['name'].lower() == name.lower():
+            return header['value']
+    return None
+
+def load_bodies(message_ids, fetcher, cache=None):
+    """Yield ``(message_id, html, error)``, serving cached bodies locally.
+
+    IDs are taken a window at a time; cache hits are yielded straight away
+    and the window's misses go to ``fetcher`` (a ``format='raw'``
+    BatchFetcher) in one go, then land in the cache.
+    """
+    window = []
+    for message_id in message_ids:
+        window.append(message_id)
+        if len(window) >= CACHE_WINDOW:
+            yield from _load_window(window, fetcher, cache)
+            window = []
+    if window:
+        yield from _load_window(window, fetcher, cache)
+
+def _load_window(message_ids, fetcher, cache):
+    misses = []
+    for message_id in message_ids:
+        html_body = None
+        if cache:
+            with metrics.span('cache.get'):
+                html_body = cache.get(message_id)
+        if html_body is None:
+            misses.append(message_id)
+        else:
+            yield message_id, html_body, None
     
-    for i, msg in enumerate(messages, 1):
+    for message_id, message, error in fetcher.fetch(misses):
+        if error is not None:
+            yield message_id, None, error
+            continue
         try:
-            # Get full message
-            message = service.users().messages().get(
-                userId='me',
-                id=msg['id'],
-                format='full'
-            ).execute()
-            
-            # Extract HTML body
-            html_body = None
-            if 'parts' in message['payload']:
-                for part in message['payload']['parts']:
-                    if part['mimeType'] == 'text/html':
-                        import base64
-                        html_body = base64.urlsafe_b64decode(
-                            part['body']['data']
-                        ).decode('utf-8')
-                        break
-            
-            if html_body:
+            html_body = html_from_raw(message['raw'])
+        except Exception as e:
+            # One undecodable message shouldn't end the run
+            yield message_id, None, e
+            continue
+        if cache:
+            with metrics.span('cache.put'):
+                cache.put(message_id, html_body or '')
+        yield message_id, html_body, None
+
+def extract_records(bodies):
+    """Turn ``(message_id, html, error)`` tuples into recipient records.
+
+    Yields ``(message_id, record, error)``; ``record`` is None when the
+    message could not be fetched or parsed.
+    """
+    for message_id, html_body, error in bodies:
+        if error is not None:
+            yield message_id, None, error
+            continue
+        
+        recipient = workflow = None
+        if html_body:
+            with metrics.span('extract.regex'):
                 recipient = extract_recipient_from_html(html_body)
                 workflow = extract_workflow_name(html_body)
-                
-                if recipient and workflow:
-                    recipients.append({
-                        'name': recipient,
-                        'workflow': workflow
-                    })
-                    print(f"{i}. {recipient} - {workflow}")
-                else:
-                    print(f"{i}. [Failed to extract: {msg['id']}]")
-            
-            # Small delay to avoid rate limits
-            time.sleep(0.1)
-            
-        except Exception as e:
-            print(f"{i}. Error processing {msg['id']}: {e}")
-            time.sleep(1)  # Longer delay on error
+        
+        if recipient and workflow:
+            yield message_id, {'name': recipient, 'workflow': workflow}, None
+        else:
+            yield message_id, None, None
+
+def compact_jsonl(jsonl_file, json_file):
+    """Rewrite a JSON Lines file as the indented JSON array, one record at a time."""
+    count = 0
+    with open(jsonl_file) as src, open(json_file, 'w') as dst:
+        for line in src:
+            if not line.strip():
+                continue
+            item = json.dumps(json.loads(line), indent=2).replace('\n', '\n  ')
+            dst.write(('[\n  ' if count == 0 else ',\n  ') + item)
+            count += 1
+        dst.write('\n]' if count else '[]')
+    return count
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Extract recipient names from Agent Hub delivery emails'
+    )
+    parser.add_argument(
+        '--batch-size',
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help=f'Messages per Gmail batch request (default: {DEFAULT_BATCH_SIZE})'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=DEFAULT_WORKERS,
+        help=f'Concurrent batch requests (default: {DEFAULT_WORKERS})'
+    )
+    parser.add_argument(
+        '--discovery-url',
+        default=os.environ.get('GMAIL_DISCOVERY_URL'),
+        help='Gmail discovery document URL, for testing against a local fake'
+    )
+    parser.add_argument(
+        '-o', '--output',
+        default=OUTPUT_JSONL,
+        help=f'JSON Lines output file, written as records arrive (default: {OUTPUT_JSONL})'
+    )
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help='Only fetch deliveries added since the last checkpointed run'
+    )
+    parser.add_argument(
+        '--checkpoint',
+        default=CHECKPOINT_PATH,
+        help=f'Checkpoint file for --incremental (default: {CHECKPOINT_PATH})'
+    )
+    parser.add_argument(
+        '--full-resync',
+        action='store_true',
+        help='Discard the checkpoint and rescan everything'
+    )
+    parser.add_argument(
+        '--cache',
+        default=CACHE_PATH,
+        help=f'Local message body cache (default: {CACHE_PATH})'
+    )
+    parser.add_argument(
+        '--cache-size-mb',
+        type=int,
+        default=DEFAULT_MAX_BYTES // (1024 * 1024),
+        help='Evict least recently used bodies beyond this size '
+             f'(default: {DEFAULT_MAX_BYTES // (1024 * 1024)})'
+    )
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Always fetch message bodies from Gmail'
+    )
+    parser.add_argument(
+        '--offline',
+        action='store_true',
+        help='Re-extract records from the cache only, without contacting Gmail'
+    )
+    parser.add_argument(
+        '--compact',
+        action='store_true',
+        help=f'Also rewrite the JSON Lines output as {OUTPUT_JSON} when done'
+    )
+    parser.add_argument(
+        '--profile',
+        metavar='FILE',
+        help='Write per-stage timings, counters and peak memory to FILE as JSON'
+    )
+    return parser.parse_args()
+
+def list_new_message_ids(service, store):
+    """Pick the cheapest listing for this run.
+
+    Returns ``(message_ids, history)``; ``history`` is the HistoryReader
+    when the checkpoint could be used, or None for a full listing.
+    """
+    if store.history_id:
+        try:
+            history = HistoryReader(service, store.history_id, label_id='SENT')
+            print(f"Incremental sync from historyId {store.history_id}\n")
+            return iter(history), history
+        except HistoryExpired as e:
+            print(f"{e}; falling back to a full resync\n")
+    return iter_message_ids(service, QUERY), None
+
+def unprocessed(message_ids, store):
+    """Drop IDs the checkpoint has already seen (and repeats within this run)."""
+    seen = set()
+    for message_id in message_ids:
+        if message_id in seen or store.is_processed(message_id):
             continue
+        seen.add(message_id)
+        yield message_id
+
+def only_deliveries(fetched, store):
+    """Keep the IDs of sent messages that are Agent Hub deliveries.
+
+    History covers every sent message, not just those matching QUERY, so
+    candidates are fetched as Subject-only metadata first; the skipped ones
+    are checkpointed so they are never fetched again.
+    """
+    for message_id, message, error in fetched:
+        if error is not None:
+            print(f"Error checking {message_id}: {error}")
+        elif SUBJECT in (get_header(message, 'Subject') or ''):
+            yield message_id
+        else:
+            store.mark_processed(message_id)
+
+def write_records(records, output, mode, store=None):
+    """Append records to ``output`` as they arrive; return the unique names.
+
+    When appending, names already in ``output`` are included, so the result
+    covers the whole file rather than just this run.
+    """
+    extracted = 0
+    unique_names = set()
+    if mode == 'a' and os.path.exists(output):
+        with open(output) as existing:
+            unique_names.update(json.loads(line)['name'] for line in existing if line.strip())
+    previous = len(unique_names)
+    with open(output, mode) as out:
+        for i, (message_id, record, error) in enumerate(records, 1):
+            if error is not None:
+                print(f"{i}. Error processing {message_id}: {error}")
+                continue
+            if record is None:
+                print(f"{i}. [Failed to extract: {message_id}]")
+            else:
+                with metrics.span('output.write'):
+                    out.write(json.dumps(record) + '\n')
+                    out.flush()
+                extracted += 1
+                unique_names.add(record['name'])
+                print(f"{i}. {record['name']} - {record['workflow']}")
+            if store:
+                # Commit with each flush, so an interrupted run is neither
+                # repeated nor skipped when the next one appends
+                store.mark_processed(message_id)
+                store.commit()
     
-    # Save results
-    output_file = 'agent_hub_recipients.json'
-    with open(output_file, 'w') as f:
-        json.dump(recipients, f, indent=2)
+    metrics.count('records.extracted', extracted)
+    print(f"\n\nExtracted {extracted} recipients "
+          f"({len(unique_names) - previous} new unique names this run)")
+    print(f"Results saved to {output}")
+    return unique_names
+
+def sync(args, cache):
+    """Fetch new deliveries from Gmail and write their records."""
+    with metrics.span('auth.service'):
+        service = get_gmail_service(args.discovery_url)
+    fetcher = BatchFetcher(
+        lambda: get_gmail_service(args.discovery_url),
+        batch_size=args.batch_size,
+        workers=args.workers,
+        message_format='raw'
+    )
+    metadata_fetcher = None
+    
+    store = None
+    mode = 'w'
+    if args.incremental:
+        store = CheckpointStore(args.checkpoint)
+        if args.full_resync:
+            store.reset()
+        # Capture the mailbox position before listing so nothing slips between runs
+        start_history_id = service.users().getProfile(userId='me').execute()['historyId']
+        message_ids, history = list_new_message_ids(service, store)
+        # Merge into the existing output unless this is the first checkpointed run
+        mode = 'a' if store.processed_count() else 'w'
+        message_ids = unprocessed(message_ids, store)
+        if history is not None:
+            metadata_fetcher = BatchFetcher(
+                lambda: get_gmail_service(args.discovery_url),
+                batch_size=args.batch_size,
+                workers=args.workers,
+                message_format='metadata',
+                metadata_headers=['Subject']
+            )
+            message_ids = only_deliveries(metadata_fetcher.fetch(message_ids), store)
+    else:
+        # Search for agent delivery emails: list pages -> IDs -> bodies -> records
+        message_ids = iter_message_ids(service, QUERY)
+    
+    completed = False
+    try:
+        records = extract_records(load_bodies(message_ids, fetcher, cache))
+        unique_names = write_records(records, args.output, mode, store)
+        completed = True
+    finally:
+        fetcher.close()
+        if metadata_fetcher:
+            metadata_fetcher.close()
+        if store:
+            failed = fetcher.failed + (metadata_fetcher.failed if metadata_fetcher else 0)
+            # Only advance past this run if nothing needs retrying next time
+            if completed and not failed:
+                store.history_id = start_history_id
+            # Commits the processed IDs even when interrupted
+            store.close()
     
-    print(f"\n\nExtracted {len(recipients)} recipients")
-    print(f"Results saved to {output_file}")
+    print(
+        f"\nFetched {fetcher.fetched} messages ({fetcher.failed} failed) "
+        f"in {fetcher.elapsed:.1f}s - {fetcher.rate:.1f} messages/sec"
+    )
+    if fetcher.backoff.throttled:
+        print(f"Retried {fetcher.backoff.throttled} throttled calls (429/5xx)")
+    return unique_names
+
+def main():
+    args = parse_args()
+    if args.profile:
+        metrics.enable()
+    cache = None
+    if not args.no_cache:
+        cache = MessageCache(args.cache, args.cache_size_mb * 1024 * 1024)
+    
+    if args.offline:
+        if cache is None:
+            sys.exit("--offline needs the message cache")
+        records = extract_records(
+            (message_id, html_body, None)
+            for message_id, html_body in cache.iter_bodies()
+        )
+        unique_names = write_records(records, args.output, 'w')
+    else:
+        unique_names = sync(args, cache)
+    
+    if cache:
+        print(f"\nCache: {cache.hits} hits, {cache.misses} misses")
+        metrics.count('cache.hits', cache.hits)
+        metrics.count('cache.misses', cache.misses)
+        cache.close()
+    
+    if args.compact:
+        with metrics.span('output.compact'):
+            compact_jsonl(args.output, OUTPUT_JSON)
+        print(f"Compacted to {OUTPUT_JSON}")
     
     # Print unique names
-    unique_names = sorted(set(r['name'] for r in recipients))
-    print(f"\n{len(unique_names)} unique recipients:")
-    for name in unique_names:
+    print(f"\n{len(unique_names)} unique recipients in {args.output}:")
+    for name in sorted(unique_names):
         print(f"  - {name}")
+    
+    if args.profile:
+        metrics.write_report(args.profile)
+        print(f"\nProfile written to {args.profile}")
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Local checkpoint store for incremental Gmail syncs."""
+
+import sqlite3
+
+# Commit processed IDs in chunks so an interrupted run keeps most of its work
+COMMIT_EVERY = 500
+
+
+class CheckpointStore:
+    """Last synced ``historyId`` plus the set of processed message IDs.
+
+    Backed by a single SQLite file; the processed set is queried per ID
+    rather than loaded, so memory stays flat as the mailbox grows.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        # Commits track output flushes one record at a time; WAL keeps them cheap
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+            CREATE TABLE IF NOT EXISTS processed (
+                message_id TEXT PRIMARY KEY
+            ) WITHOUT ROWID;
+        """)
+        self._uncommitted = 0
+
+    def close(self):
+        self._conn.commit()
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def history_id(self):
+        row = self._conn.execute(
+            "SELECT value FROM meta WHERE key = 'history_id'"
+        ).fetchone()
+        return row[0] if row else None
+
+    @history_id.setter
+    def history_id(self, value):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('history_id', ?)",
+            (str(value),)
+        )
+        self._conn.commit()
+
+    def is_processed(self, message_id):
+        return self._conn.execute(
+            "SELECT 1 FROM processed WHERE message_id = ?", (message_id,)
+        ).fetchone() is not None
+
+    def processed_count(self):
+        return self._conn.execute("SELECT COUNT(*) FROM processed").fetchone()[0]
+
+    def mark_processed(self, message_id):
+        self._conn.execute(
+            "INSERT OR IGNORE INTO processed (message_id) VALUES (?)",
+            (message_id,)
+        )
+        self._uncommitted += 1
+        if self._uncommitted >= COMMIT_EVERY:
+            self.commit()
+
+    def commit(self):
+        self._conn.commit()
+        self._uncommitted = 0
+
+    def reset(self):
+        """Forget everything, e.g. before a clean full resync."""
+        self._conn.execute("DELETE FROM processed")
+        self._conn.execute("DELETE FROM meta")
+        self.commit()
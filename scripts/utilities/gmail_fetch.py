@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""Concurrent, batched Gmail message fetching with adaptive backoff."""
+
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from googleapiclient.errors import HttpError
+
+from metrics import metrics
+
+# Gmail accepts up to 100 calls per batch, but batches above ~50 are
+# likely to trip per-user rate limits.
+DEFAULT_BATCH_SIZE = 50
+MAX_BATCH_SIZE = 100
+DEFAULT_WORKERS = 4
+# messages.list allows up to 500 IDs per page
+LIST_PAGE_SIZE = 500
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+def is_retryable(exception):
+    """Return True if a failed call is worth retrying after a backoff."""
+    if isinstance(exception, HttpError):
+        return exception.resp.status in RETRYABLE_STATUSES
+    return isinstance(exception, (OSError, TimeoutError))
+
+
+def iter_message_ids(service, query, page_size=LIST_PAGE_SIZE):
+    """Yield every message ID matching ``query``, following nextPageToken."""
+    page_token = None
+    while True:
+        request = service.users().messages().list(
+            userId='me',
+            q=query,
+            maxResults=page_size,
+            pageToken=page_token
+        )
+        with metrics.span('gmail.list'):
+            response = request.execute()
+        for msg in response.get('messages', []):
+            yield msg['id']
+        page_token = response.get('nextPageToken')
+        if not page_token:
+            return
+
+
+class HistoryExpired(Exception):
+    """The stored historyId has fallen out of Gmail's history window."""
+
+
+class HistoryReader:
+    """Iterate IDs of messages added since ``start_history_id``.
+
+    The first history page is requested up front so an expired checkpoint
+    surfaces as HistoryExpired before any pipeline starts.
+    """
+
+    def __init__(self, service, start_history_id, label_id=None):
+        self.service = service
+        self.start_history_id = start_history_id
+        self.label_id = label_id
+        self._first_page = self._page(None)
+
+    def _page(self, page_token):
+        try:
+            with metrics.span('gmail.history'):
+                response = self.service.users().history().list(
+                    userId='me',
+                    startHistoryId=self.start_history_id,
+                    historyTypes='messageAdded',
+                    labelId=self.label_id,
+                    pageToken=page_token
+                ).execute()
+        except HttpError as e:
+            if e.resp.status == 404:
+                raise HistoryExpired(
+                    f"historyId {self.start_history_id} is no longer available"
+                ) from e
+            raise
+        return response
+
+    def __iter__(self):
+        response = self._first_page
+        while True:
+            for record in response.get('history', []):
+                for added in record.get('messagesAdded', []):
+                    yield added['message']['id']
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                return
+            response = self._page(page_token)
+
+
+class AdaptiveBackoff:
+    """Delay shared by all workers, driven by the share of throttled calls.
+
+    The shared delay only grows while more than ``tolerance`` of the calls
+    in a round trip come back 429/5xx, and never past ``maximum`` scaled by
+    that share; otherwise it decays. A few throttled calls in a batch are
+    just retried in a smaller sub-batch after their own backoff, so the
+    fetch keeps running at full speed under a low, steady error rate.
+    """
+
+    def __init__(self, initial=0.5, maximum=32.0, decay=0.5, tolerance=0.1):
+        self.initial = initial
+        self.maximum = maximum
+        self.decay = decay
+        self.tolerance = tolerance
+        self.delay = 0.0
+        self.throttled = 0
+        self._lock = threading.Lock()
+
+    def observe(self, throttled, total, adjust=True):
+        """Record a round trip where ``throttled`` of ``total`` calls got 429/5xx.
+
+        With ``adjust=False`` the calls are only counted; retry sub-batches
+        are too small for their share to say much about the error rate.
+        """
+        share = throttled / total if total else 0.0
+        with self._lock:
+            self.throttled += throttled
+            if not adjust:
+                return
+            if share > self.tolerance:
+                self.delay = min(max(self.delay * 2, self.initial),
+                                 self.maximum * share)
+            else:
+                self.delay *= self.decay
+                if self.delay < self.initial / 4:
+                    self.delay = 0.0
+
+    def wait(self):
+        """Sleep for the current delay with full jitter (no-op when zero)."""
+        delay = self.delay
+        if delay:
+            time.sleep(random.uniform(0, delay))
+
+    def wait_retry(self, attempt):
+        """Sleep before retrying throttled calls, exponential in ``attempt``."""
+        time.sleep(random.uniform(0, min(self.initial * 2 ** (attempt - 1), self.maximum)))
+
+
+class BatchFetcher:
+    """Fetch messages through Gmail batch requests on a bounded worker pool.
+
+    ``service_factory`` is called once per worker thread, since
+    googleapiclient service objects (and their httplib2 transport) are not
+    thread-safe. The worker pool is kept across fetch() calls so those
+    services are reused; close() (or a ``with`` block) shuts it down.
+    """
+
+    def __init__(self, service_factory, batch_size=DEFAULT_BATCH_SIZE,
+                 workers=DEFAULT_WORKERS, message_format='full',
+                 metadata_headers=None, max_retries=5, backoff=None):
+        if not 1 <= batch_size <= MAX_BATCH_SIZE:
+            raise ValueError(
+                f"batch_size must be between 1 and {MAX_BATCH_SIZE}"
+            )
+        self.service_factory = service_factory
+        self.batch_size = batch_size
+        self.workers = max(1, workers)
+        self.message_format = message_format
+        self.metadata_headers = metadata_headers
+        self.max_retries = max_retries
+        self.backoff = backoff or AdaptiveBackoff()
+        self.fetched = 0
+        self.failed = 0
+        self.elapsed = 0.0
+        self._local = threading.local()
+        self._executor = None
+
+    def close(self):
+        """Shut down the worker pool; a later fetch() starts a new one."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def rate(self):
+        """Messages per second over the time spent in fetch() calls."""
+        total = self.fetched + self.failed
+        return total / self.elapsed if self.elapsed else 0.0
+
+    def _service(self):
+        service = getattr(self._local, 'service', None)
+        if service is None:
+            with metrics.span('auth.service'):
+                service = self._local.service = self.service_factory()
+        return service
+
+    def _fetch_batch(self, ids):
+        """Fetch one batch, retrying only the calls that were throttled."""
+        results = {}
+        pending = list(ids)
+        attempt = 0
+
+        while pending:
+            if attempt:
+                self.backoff.wait_retry(attempt)
+            self.backoff.wait()
+            service = self._service()
+            retry = []
+
+            def callback(request_id, response, exception):
+                if exception is None:
+                    results[request_id] = (response, None)
+                elif is_retryable(exception) and attempt < self.max_retries:
+                    retry.append(request_id)
+                else:
+                    results[request_id] = (None, exception)
+
+            params = {'userId': 'me', 'format': self.message_format}
+            if self.metadata_headers:
+                params['metadataHeaders'] = self.metadata_headers
+
+            batch = service.new_batch_http_request(callback=callback)
+            for message_id in pending:
+                batch.add(
+                    service.users().messages().get(id=message_id, **params),
+                    request_id=message_id
+                )
+
+            try:
+                with metrics.span('gmail.batch'):
+                    batch.execute()
+            except Exception as e:
+                # The batch envelope itself failed; every call in it is unanswered
+                retry = [m for m in pending if m not in results]
+                # Nothing to retry if every callback already landed
+                if is_retryable(e) and retry:
+                    self.backoff.observe(len(retry), len(retry), adjust=attempt == 0)
+                if not is_retryable(e) or attempt >= self.max_retries:
+                    for message_id in retry:
+                        results[message_id] = (None, e)
+                    retry = []
+            else:
+                self.backoff.observe(len(retry), len(pending), adjust=attempt == 0)
+
+            metrics.count('gmail.retried', len(retry))
+            pending = retry
+            attempt += 1
+
+        return [(m,) + results[m] for m in ids]
+
+    def _batches(self, message_ids):
+        batch = []
+        for message_id in message_ids:
+            batch.append(message_id)
+            if len(batch) == self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def fetch(self, message_ids):
+        """Yield ``(message_id, message, error)`` as batches complete.
+
+        ``message_ids`` may be any iterable, including a lazy generator; at
+        most ``2 * workers`` batches are in flight at once, so memory stays
+        bounded regardless of how many IDs are fed in. Counters and
+        ``elapsed`` accumulate across calls.
+        """
+        started = time.monotonic() - self.elapsed
+        batches = self._batches(message_ids)
+        max_in_flight = self.workers * 2
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers)
+
+        in_flight = set()
+        exhausted = False
+        try:
+            while in_flight or not exhausted:
+                while not exhausted and len(in_flight) < max_in_flight:
+                    batch = next(batches, None)
+                    if batch is None:
+                        exhausted = True
+                    else:
+                        in_flight.add(
+                            self._executor.submit(self._fetch_batch, batch)
+                        )
+                if not in_flight:
+                    break
+
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    for message_id, message, error in future.result():
+                        if error is None:
+                            self.fetched += 1
+                            metrics.count('gmail.fetched')
+                        else:
+                            self.failed += 1
+                            metrics.count('gmail.failed')
+                        self.elapsed = time.monotonic() - started
+                        yield message_id, message, error
+        finally:
+            for future in in_flight:
+                future.cancel()
+            if in_flight:
+                # An abandoned fetch must not leave batches running into the next one
+                wait(in_flight)
+            self.elapsed = time.monotonic() - started
@@ -0,0 +1,566 @@
+#!/usr/bin/env python3
+"""
+Corbin Memory Store
+SQLite-backed store for memory/memory_index.json with indexed, partial updates
+"""
+
+import argparse
+import copy
+import fcntl
+import json
+import os
+import sqlite3
+import sys
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+DEFAULT_JSON_PATH = Path('memory') / 'memory_index.json'
+DB_NAME = 'memory_store.db'
+LOCK_NAME = 'memory_store.lock'
+BUSY_TIMEOUT = 30
+# Attempts at a write + export when memory_index.json is edited underneath it
+CONFLICT_RETRIES = 3
+
+# List sections kept as table rows instead of inside their parent document.
+# entities and tasks get dedicated indexed tables; the rest are append logs.
+ENTITIES = 'entities'
+TASKS = 'tasks_and_reminders'
+LOG_SECTIONS = (
+    'memory.key_facts',
+    'memory.past_decisions',
+    'memory.project_overviews',
+    'memory.interaction_summaries',
+    'context.recent_files_accessed',
+    'agent_insights.internal_notes',
+    'agent_insights.behavioral_observations',
+    'agent_insights.learning_log',
+)
+LIST_SECTIONS = (ENTITIES, TASKS) + LOG_SECTIONS
+DUE_KEYS = ('due_date', 'due', 'due_at', 'remind_at')
+
+
+class MemoryStoreError(Exception):
+    """Invalid path or operation on the memory store"""
+
+
+class MemoryConflict(MemoryStoreError):
+    """memory_index.json was edited directly while the store had writes it hadn't exported"""
+
+
+def split_path(path: str) -> List[str]:
+    return [part for part in path.split('.') if part]
+
+
+def _task_due(task: Any) -> Optional[str]:
+    if isinstance(task, dict):
+        for key in DUE_KEYS:
+            if task.get(key):
+                return str(task[key])
+    return None
+
+
+def _entity_name(entity: Any) -> Optional[str]:
+    return entity.get('name') if isinstance(entity, dict) else None
+
+
+class MemoryStore:
+    """Same logical schema as default_memory_structure.json, stored in SQLite
+
+    Top-level sections are stored as separate JSON rows, so an update only
+    rewrites the section it touches. Entities, tasks and the append-heavy
+    lists (interaction summaries, learning log, ...) are stored one item per
+    row, with indexes on entity name and task due date. Writes hold an
+    exclusive file lock, so concurrent scheduled tasks don't clobber each
+    other.
+
+    When ``json_path`` is given, the store re-imports it whenever the file
+    changed since the last import/export. Agents that edit
+    memory_index.json directly therefore stay in sync. Writes not yet
+    exported are never replaced that way; sync() raises MemoryConflict
+    instead.
+    """
+
+    def __init__(self, db_path=None, json_path=None):
+        self.json_path = Path(json_path) if json_path else None
+        base = self.json_path.parent if self.json_path else Path('.')
+        self.db_path = Path(db_path) if db_path else base / DB_NAME
+        self.lock_path = self.db_path.with_name(LOCK_NAME)
+        self._conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+            CREATE TABLE IF NOT EXISTS sections (
+                key TEXT PRIMARY KEY,
+                position INTEGER NOT NULL,
+                value TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS entities (
+                id INTEGER PRIMARY KEY,
+                name TEXT COLLATE NOCASE,
+                data TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS entities_name ON entities (name);
+            CREATE TABLE IF NOT EXISTS tasks (
+                id INTEGER PRIMARY KEY,
+                due_date TEXT,
+                data TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS tasks_due_date ON tasks (due_date);
+            CREATE TABLE IF NOT EXISTS log_entries (
+                id INTEGER PRIMARY KEY,
+                section TEXT NOT NULL,
+                data TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS log_entries_section ON log_entries (section, id);
+        """)
+        self._lock_depth = 0
+        self._lock_file = None
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # -- locking and transactions -------------------------------------------
+
+    @contextmanager
+    def locked(self) -> Iterator[None]:
+        """Exclusive inter-process lock plus one SQLite transaction (re-entrant)"""
+        if self._lock_depth:
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+            return
+
+        self._lock_file = open(self.lock_path, 'a')
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+        self._lock_depth = 1
+        try:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+            self._conn.execute('COMMIT')
+        finally:
+            self._lock_depth = 0
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+            self._lock_file.close()
+            self._lock_file = None
+
+    def _meta(self, key: str) -> Optional[str]:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: str):
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def unexported(self) -> bool:
+        """Whether the store has writes that memory_index.json doesn't have yet"""
+        return self._meta('unexported') == '1'
+
+    def _mark_unexported(self, value: bool = True):
+        if self.json_path:
+            self._set_meta('unexported', '1' if value else '0')
+
+    # -- JSON compatibility -------------------------------------------------
+
+    def _json_mtime(self) -> Optional[str]:
+        if self.json_path and self.json_path.exists():
+            return str(self.json_path.stat().st_mtime_ns)
+        return None
+
+    def sync(self):
+        """Re-import memory_index.json if it changed since the store last saw it"""
+        mtime = self._json_mtime()
+        if mtime is None or mtime == self._meta('json_mtime_ns'):
+            return
+        with self.locked():
+            # Re-check under the lock; another process may have just imported it
+            if self._json_mtime() == self._meta('json_mtime_ns'):
+                return
+            if self.unexported():
+                raise MemoryConflict(
+                    f"{self.json_path} was edited directly, but the store has writes "
+                    "it doesn't have; run 'export' to keep the store's version or "
+                    "'import' to keep the file's"
+                )
+            self.import_json()
+
+    def import_json(self, path=None):
+        """Replace the store's contents with a memory_index.json document"""
+        path = Path(path) if path else self.json_path
+        with open(path) as f:
+            document = json.load(f)
+        with self.locked():
+            for table in ('sections', 'entities', 'tasks', 'log_entries'):
+                self._conn.execute(f"DELETE FROM {table}")
+            for position, (key, value) in enumerate(document.items()):
+                self._store_section(key, value, position)
+            if path == self.json_path:
+                self._set_meta('json_mtime_ns', self._json_mtime())
+            self._mark_unexported(path != self.json_path)
+
+    def export_json(self, path=None, force: bool = False):
+        """Write the full document in the memory_index.json layout, atomically
+
+        Refuses (MemoryConflict) to overwrite direct edits it hasn't imported
+        unless ``force`` is set.
+        """
+        path = Path(path) if path else self.json_path
+        with self.locked():
+            document = self.document()
+            tmp = path.with_name(path.name + '.tmp')
+            with open(tmp, 'w') as f:
+                json.dump(document, f, indent=2, ensure_ascii=False)
+                f.write('\n')
+            # Direct edits to the JSON don't take the lock; never overwrite one
+            # the store hasn't imported. The caller's transaction rolls back.
+            if (path == self.json_path and not force
+                    and self._json_mtime() != self._meta('json_mtime_ns')):
+                tmp.unlink()
+                raise MemoryConflict(f"{path} changed since it was last synced")
+            os.replace(tmp, path)
+            if path == self.json_path:
+                self._set_meta('json_mtime_ns', self._json_mtime())
+                self._mark_unexported(False)
+
+    def document(self) -> Dict:
+        rows = self._conn.execute("SELECT key FROM sections ORDER BY position").fetchall()
+        return {key: self._load_section(key) for (key,) in rows}
+
+    # -- sections -----------------------------------------------------------
+
+    def _store_section(self, key: str, value: Any, position: Optional[int] = None):
+        """Store a top-level section, moving nested list sections into their tables"""
+        value = copy.deepcopy(value)
+        for list_path in LIST_SECTIONS:
+            parts = split_path(list_path)
+            if parts[0] != key:
+                continue
+            if len(parts) == 1:
+                self._replace_list(list_path, value if isinstance(value, list) else [])
+                value = []
+                continue
+            parent = value
+            for part in parts[1:-1]:
+                parent = parent.get(part) if isinstance(parent, dict) else None
+            if isinstance(parent, dict) and parts[-1] in parent:
+                self._replace_list(list_path, parent[parts[-1]] or [])
+                # Keep an empty placeholder so key order survives the export
+                parent[parts[-1]] = []
+
+        if position is None:
+            row = self._conn.execute("SELECT position FROM sections WHERE key = ?", (key,)).fetchone()
+            position = row[0] if row else self._conn.execute(
+                "SELECT COALESCE(MAX(position) + 1, 0) FROM sections"
+            ).fetchone()[0]
+        self._conn.execute(
+            "INSERT OR REPLACE INTO sections (key, position, value) VALUES (?, ?, ?)",
+            (key, position, json.dumps(value))
+        )
+
+    def _load_section(self, key: str) -> Any:
+        row = self._conn.execute("SELECT value FROM sections WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        value = json.loads(row[0])
+        for list_path in LIST_SECTIONS:
+            parts = split_path(list_path)
+            if parts[0] != key:
+                continue
+            if len(parts) == 1:
+                value = self.list_items(list_path)
+                continue
+            parent = value
+            for part in parts[1:-1]:
+                parent = parent.get(part) if isinstance(parent, dict) else None
+            if isinstance(parent, dict) and parts[-1] in parent:
+                parent[parts[-1]] = self.list_items(list_path)
+        return value
+
+    # -- list sections ------------------------------------------------------
+
+    def _replace_list(self, section: str, items: List):
+        if section == ENTITIES:
+            self._conn.execute("DELETE FROM entities")
+        elif section == TASKS:
+            self._conn.execute("DELETE FROM tasks")
+        else:
+            self._conn.execute("DELETE FROM log_entries WHERE section = ?", (section,))
+        for item in items:
+            self._insert_item(section, item)
+
+    def _insert_item(self, section: str, item: Any):
+        data = json.dumps(item)
+        if section == ENTITIES:
+            self._conn.execute(
+                "INSERT INTO entities (name, data) VALUES (?, ?)", (_entity_name(item), data)
+            )
+        elif section == TASKS:
+            self._conn.execute(
+                "INSERT INTO tasks (due_date, data) VALUES (?, ?)", (_task_due(item), data)
+            )
+        else:
+            self._conn.execute(
+                "INSERT INTO log_entries (section, data) VALUES (?, ?)", (section, data)
+            )
+
+    def list_items(self, section: str, limit: Optional[int] = None) -> List:
+        """Items of a list section in insertion order; ``limit`` keeps the newest N"""
+        if section == ENTITIES:
+            sql, params = "SELECT data FROM entities", ()
+        elif section == TASKS:
+            sql, params = "SELECT data FROM tasks", ()
+        elif section in LOG_SECTIONS:
+            sql, params = "SELECT data FROM log_entries WHERE section = ?", (section,)
+        else:
+            raise MemoryStoreError(f"'{section}' is not a list section")
+        if limit is None:
+            rows = self._conn.execute(sql + " ORDER BY id", params).fetchall()
+        else:
+            rows = self._conn.execute(sql + " ORDER BY id DESC LIMIT ?", params + (limit,)).fetchall()
+            rows.reverse()
+        return [json.loads(data) for (data,) in rows]
+
+    def append(self, section: str, item: Any):
+        """Append one item to a list section without touching anything else"""
+        if section not in LIST_SECTIONS:
+            raise MemoryStoreError(f"'{section}' is not a list section")
+        with self.locked():
+            self._insert_item(section, item)
+            self._mark_unexported()
+
+    def find_entities(self, name: str, prefix: bool = False) -> List[Dict]:
+        """Entities by name (case-insensitive), using the name index"""
+        if prefix:
+            escaped = name.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            rows = self._conn.execute(
+                "SELECT data FROM entities WHERE name LIKE ? ESCAPE '\\' ORDER BY id",
+                (escaped + '%',)
+            )
+        else:
+            rows = self._conn.execute(
+                "SELECT data FROM entities WHERE name = ? ORDER BY id", (name,)
+            )
+        return [json.loads(data) for (data,) in rows]
+
+    def upsert_entity(self, entity: Dict):
+        """Replace the entity with the same name, or add it"""
+        name = _entity_name(entity)
+        if not name:
+            raise MemoryStoreError("entity needs a 'name'")
+        with self.locked():
+            updated = self._conn.execute(
+                "UPDATE entities SET name = ?, data = ? WHERE id = ("
+                "SELECT id FROM entities WHERE name = ? ORDER BY id LIMIT 1)",
+                (name, json.dumps(entity), name)
+            ).rowcount
+            if not updated:
+                self._insert_item(ENTITIES, entity)
+            self._mark_unexported()
+
+    def tasks_due(self, before: Optional[str] = None, after: Optional[str] = None) -> List[Dict]:
+        """Tasks with a due date in [after, before), soonest first, using the due-date index
+
+        Dates compare as strings, so use ISO 8601 throughout.
+        """
+        clauses, params = ["due_date IS NOT NULL"], []
+        if after:
+            clauses.append("due_date >= ?")
+            params.append(after)
+        if before:
+            clauses.append("due_date < ?")
+            params.append(before)
+        rows = self._conn.execute(
+            f"SELECT data FROM tasks WHERE {' AND '.join(clauses)} ORDER BY due_date, id",
+            params
+        )
+        return [json.loads(data) for (data,) in rows]
+
+    # -- dotted-path access -------------------------------------------------
+
+    def get(self, path: str) -> Any:
+        """Value at a dotted path (e.g. custom_memory.scheduled_tasks.calendar_check)"""
+        parts = split_path(path)
+        if not parts:
+            return self.document()
+        if path in LIST_SECTIONS:
+            return self.list_items(path)
+        value = self._load_section(parts[0])
+        for part in parts[1:]:
+            if isinstance(value, dict):
+                value = value.get(part)
+            elif isinstance(value, list) and part.lstrip('-').isdigit():
+                index = int(part)
+                value = value[index] if -len(value) <= index < len(value) else None
+            else:
+                return None
+        return value
+
+    def set(self, path: str, value: Any):
+        """Set the value at a dotted path, rewriting only the enclosing section"""
+        parts = split_path(path)
+        if not parts:
+            raise MemoryStoreError("empty path")
+        for list_path in LIST_SECTIONS:
+            if path.startswith(list_path + '.'):
+                raise MemoryStoreError(
+                    f"'{path}' is inside list section '{list_path}'; "
+                    "use append/upsert-entity or set the whole list"
+                )
+        with self.locked():
+            self._mark_unexported()
+            if len(parts) == 1:
+                self._store_section(parts[0], value)
+                return
+            section = self._load_section(parts[0])
+            if not isinstance(section, dict):
+                section = {}
+            parent = section
+            for part in parts[1:-1]:
+                if not isinstance(parent.get(part), dict):
+                    parent[part] = {}
+                parent = parent[part]
+            parent[parts[-1]] = value
+            self._store_section(parts[0], section)
+
+    def update(self, assignments: Dict[str, Any]):
+        """Apply several set() calls atomically"""
+        with self.locked():
+            for path, value in assignments.items():
+                self.set(path, value)
+
+
+def parse_value(text: str) -> Any:
+    """JSON if it parses, otherwise the raw string (convenient from shell)"""
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return text
+
+
+def run_command(store: MemoryStore, args, parser) -> Any:
+    """Sync with memory_index.json, then run one CLI command; returns its result"""
+    if args.command == 'export' and store.unexported():
+        # Settles a conflict in favour of the store
+        store.export_json(args.file, force=True)
+        return None
+    store.sync()
+    if args.command == 'export':
+        store.export_json(args.file)
+    elif args.command == 'get':
+        return store.get(args.path)
+    elif args.command == 'keys':
+        value = store.get(args.path)
+        print("\n".join(value.keys() if isinstance(value, dict) else []))
+    elif args.command == 'set':
+        assignments = {}
+        for assignment in args.assignments:
+            path, sep, text = assignment.partition('=')
+            if not sep:
+                parser.error(f"expected PATH=JSON, got '{assignment}'")
+            assignments[path] = parse_value(text)
+        store.update(assignments)
+    elif args.command == 'append':
+        store.append(args.section, parse_value(args.item))
+    elif args.command == 'log':
+        return store.list_items(args.section, args.limit)
+    elif args.command == 'entity':
+        return store.find_entities(args.name, args.prefix)
+    elif args.command == 'upsert-entity':
+        store.upsert_entity(parse_value(args.entity))
+    elif args.command == 'tasks-due':
+        return store.tasks_due(args.before, args.after)
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Indexed, lock-protected store behind memory/memory_index.json'
+    )
+    parser.add_argument(
+        '--json',
+        default=os.environ.get('CORBIN_MEMORY_JSON', str(DEFAULT_JSON_PATH)),
+        help=f'memory_index.json to sync with (default: {DEFAULT_JSON_PATH})'
+    )
+    parser.add_argument('--db', help=f'SQLite store (default: {DB_NAME} next to --json)')
+    parser.add_argument(
+        '--no-export',
+        dest='export',
+        action='store_false',
+        help="Don't rewrite --json after a write (it is no longer re-imported "
+             "when edited until the store is exported)"
+    )
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('import', help='Replace the store with a JSON document')
+    p.add_argument('file', nargs='?')
+    p = sub.add_parser('export', help='Write the store out in the JSON layout')
+    p.add_argument('file', nargs='?')
+    p = sub.add_parser('get', help='Print the JSON value at a dotted path')
+    p.add_argument('path', nargs='?', default='')
+    p = sub.add_parser('keys', help='Print the keys of the object at a dotted path')
+    p.add_argument('path', nargs='?', default='')
+    p = sub.add_parser('set', help='Atomically set one or more PATH=JSON values')
+    p.add_argument('assignments', nargs='+', metavar='PATH=JSON')
+    p = sub.add_parser('append', help='Append an item to a list section')
+    p.add_argument('section', choices=LIST_SECTIONS)
+    p.add_argument('item')
+    p = sub.add_parser('log', help='Print a list section')
+    p.add_argument('section', choices=LIST_SECTIONS)
+    p.add_argument('-n', '--limit', type=int, help='Only the newest N items')
+    p = sub.add_parser('entity', help='Look up entities by name')
+    p.add_argument('name')
+    p.add_argument('--prefix', action='store_true', help='Match names starting with NAME')
+    p = sub.add_parser('upsert-entity', help='Add or replace an entity by name')
+    p.add_argument('entity')
+    p = sub.add_parser('tasks-due', help='Tasks by due date (ISO 8601)')
+    p.add_argument('--before')
+    p.add_argument('--after')
+
+    args = parser.parse_args()
+
+    try:
+        with MemoryStore(args.db, args.json) as store:
+            if args.command == 'import':
+                store.import_json(args.file)
+                return
+
+            # A write and its export run under one lock, so nothing can
+            # change memory_index.json between the sync and the export
+            write = args.command in ('set', 'append', 'upsert-entity')
+            exclusive = write or args.command == 'export'
+            for attempt in range(CONFLICT_RETRIES):
+                try:
+                    with store.locked() if exclusive else nullcontext():
+                        result = run_command(store, args, parser)
+                        if write and args.export:
+                            store.export_json()
+                    break
+                except MemoryConflict:
+                    # Rolled back; sync picks up the direct edit and the write is
+                    # redone, unless earlier --no-export writes are in the way
+                    if attempt == CONFLICT_RETRIES - 1 or store.unexported():
+                        raise
+            if args.command in ('get', 'log', 'entity', 'tasks-due'):
+                print(json.dumps(result, indent=2, ensure_ascii=False))
+
+    except (MemoryStoreError, OSError, json.JSONDecodeError, sqlite3.Error) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""On-disk cache of decoded Gmail HTML bodies, with LRU eviction."""
+
+import base64
+import hashlib
+import sqlite3
+import time
+from email.parser import BytesFeedParser
+
+from metrics import metrics
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# Evict down to this fraction of the cap so every put doesn't trigger eviction
+EVICT_TO = 0.9
+FEED_CHUNK = 64 * 1024
+COMMIT_EVERY = 200
+
+
+def html_from_raw(raw):
+    """Return the text/html part of a ``format='raw'`` message.
+
+    The RFC 822 bytes are fed to the parser in chunks, then the MIME tree is
+    walked so text/html nested inside multipart/mixed > multipart/alternative
+    is found too.
+    """
+    with metrics.span('decode.base64'):
+        data = base64.urlsafe_b64decode(raw)
+    with metrics.span('decode.mime'):
+        # The compat32 policy skips header object parsing, several times faster
+        parser = BytesFeedParser()
+        for start in range(0, len(data), FEED_CHUNK):
+            parser.feed(data[start:start + FEED_CHUNK])
+        message = parser.close()
+
+        for part in message.walk():
+            if part.get_content_type() == 'text/html':
+                payload = part.get_payload(decode=True)
+                try:
+                    return payload.decode(part.get_content_charset() or 'utf-8', errors='replace')
+                except LookupError:
+                    # Unknown charset label; the template text is ASCII anyway
+                    return payload.decode('utf-8', errors='replace')
+    return None
+
+
+class MessageCache:
+    """Decoded HTML bodies keyed by message ID, stored content-addressed.
+
+    Bodies live in one table keyed by their SHA-256, so the many identical
+    template renders share storage; message IDs point at a digest. When the
+    stored bodies exceed ``max_bytes``, the least recently used message IDs
+    are dropped along with any bodies nothing points at any more.
+    """
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._uncommitted = 0
+        self._conn = sqlite3.connect(path)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS bodies (
+                digest TEXT PRIMARY KEY,
+                html TEXT NOT NULL,
+                size INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS messages (
+                message_id TEXT PRIMARY KEY,
+                digest TEXT NOT NULL,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS messages_last_access
+                ON messages (last_access);
+        """)
+        self.size = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM bodies"
+        ).fetchone()[0]
+
+    def close(self):
+        self._conn.commit()
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def get(self, message_id):
+        """Return the cached HTML ('' if the message had none), or None on a miss."""
+        row = self._conn.execute(
+            "SELECT b.html FROM messages m JOIN bodies b ON b.digest = m.digest "
+            "WHERE m.message_id = ?",
+            (message_id,)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._conn.execute(
+            "UPDATE messages SET last_access = ? WHERE message_id = ?",
+            (time.time(), message_id)
+        )
+        return row[0]
+
+    def put(self, message_id, html):
+        """Cache ``html`` for ``message_id``; pass '' for messages without HTML."""
+        encoded = html.encode('utf-8')
+        digest = hashlib.sha256(encoded).hexdigest()
+        inserted = self._conn.execute(
+            "INSERT OR IGNORE INTO bodies (digest, html, size) VALUES (?, ?, ?)",
+            (digest, html, len(encoded))
+        ).rowcount
+        if inserted:
+            self.size += len(encoded)
+        self._conn.execute(
+            "INSERT OR REPLACE INTO messages (message_id, digest, last_access) "
+            "VALUES (?, ?, ?)",
+            (message_id, digest, time.time())
+        )
+        if self.size > self.max_bytes:
+            self.evict()
+        self._uncommitted += 1
+        if self._uncommitted >= COMMIT_EVERY:
+            self._conn.commit()
+            self._uncommitted = 0
+
+    def evict(self):
+        """Drop least recently used messages until under the size cap."""
+        target = self.max_bytes * EVICT_TO
+        while self.size > target:
+            removed = self._conn.execute(
+                "DELETE FROM messages WHERE message_id IN ("
+                "SELECT message_id FROM messages ORDER BY last_access LIMIT 100)"
+            ).rowcount
+            self._conn.execute(
+                "DELETE FROM bodies WHERE digest NOT IN (SELECT digest FROM messages)"
+            )
+            self.size = self._conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM bodies"
+            ).fetchone()[0]
+            if not removed:
+                break
+
+    def iter_bodies(self):
+        """Yield ``(message_id, html)`` for every cached message, oldest first."""
+        cursor = self._conn.execute(
+            "SELECT m.message_id, b.html FROM messages m "
+            "JOIN bodies b ON b.digest = m.digest ORDER BY m.last_access"
+        )
+        yield from cursor
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Lightweight timing spans and counters shared by the utility scripts
+
+Disabled by default, so instrumented hot paths cost one attribute check.
+Scripts enable it for --profile and write the report as JSON.
+"""
+
+import json
+import math
+import random
+import resource
+import sys
+import threading
+import time
+from contextlib import nullcontext
+from typing import Dict, List
+
+# Per-span latency samples kept for percentiles (reservoir sampled beyond this)
+RESERVOIR_SIZE = 10000
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)
+    return sorted_values[rank]
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+class _Span:
+    __slots__ = ('count', 'total', 'max', 'samples')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples: List[float] = []
+
+
+class _Timer:
+    __slots__ = ('metrics', 'name', 'started')
+
+    def __init__(self, metrics, name: str):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.metrics.record(self.name, time.perf_counter() - self.started)
+
+
+_DISABLED = nullcontext()
+
+
+class Metrics:
+    """Thread-safe span timings and counters"""
+
+    def __init__(self):
+        self.enabled = False
+        self._spans: Dict[str, _Span] = {}
+        self._counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+
+    def enable(self):
+        self.enabled = True
+        self._started = time.perf_counter()
+
+    def record(self, name: str, seconds: float):
+        if not self.enabled:
+            return
+        with self._lock:
+            span = self._spans.get(name)
+            if span is None:
+                span = self._spans[name] = _Span()
+            span.count += 1
+            span.total += seconds
+            span.max = max(span.max, seconds)
+            if len(span.samples) < RESERVOIR_SIZE:
+                span.samples.append(seconds)
+            else:
+                slot = random.randrange(span.count)
+                if slot < RESERVOIR_SIZE:
+                    span.samples[slot] = seconds
+
+    def span(self, name: str):
+        """Context manager timing its body under ``name``"""
+        return _Timer(self, name) if self.enabled else _DISABLED
+
+    def count(self, name: str, value: int = 1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def report(self) -> Dict:
+        with self._lock:
+            spans = {}
+            for name, span in sorted(self._spans.items()):
+                samples = sorted(span.samples)
+                spans[name] = {
+                    'count': span.count,
+                    'total_ms': round(span.total * 1000, 4),
+                    'mean_ms': round(span.total / span.count * 1000, 4),
+                    'p50_ms': round(percentile(samples, 50) * 1000, 4),
+                    'p95_ms': round(percentile(samples, 95) * 1000, 4),
+                    'p99_ms': round(percentile(samples, 99) * 1000, 4),
+                    'max_ms': round(span.max * 1000, 4),
+                }
+            return {
+                'wall_ms': round((time.perf_counter() - self._started) * 1000, 4),
+                'peak_rss_mb': round(peak_rss_mb(), 1),
+                'spans': spans,
+                'counters': dict(sorted(self._counters.items())),
+            }
+
+    def write_report(self, path: str):
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+            f.write('\n')
+
+
+# Process-wide instance used by all instrumented modules
+metrics = Metrics()
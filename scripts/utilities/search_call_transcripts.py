@@ -4,61 +4,442 @@ Vertex AI Search - Call Transcripts Query Tool
 Provides semantic search over call transcripts stored in Google Drive
 """
 
+import os
+import sys
+
+# Add script directory to path for sibling imports
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
 import json
+import queue
+import socket
 import subprocess
-import sys
 import argparse
-from typing import Dict, List
+import threading
+import time
+import http.client
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timezone
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from metrics import metrics, percentile
+from transcript_cache import ResultCache, STALE
+from transcript_index import LocalTranscriptIndex
+
+DEFAULT_ENDPOINT = "https://discoveryengine.googleapis.com"
+SEARCH_PATH = (
+    "/v1alpha/projects/{project_id}/locations/global/collections/"
+    "default_collection/engines/{engine_id}/servingConfigs/default_search:search"
+)
+CLOUD_PLATFORM_SCOPE = "https://www.googleapis.com/auth/cloud-platform"
+# gcloud does not report expiry; its tokens live an hour, but may be cached already
+GCLOUD_TOKEN_LIFETIME = 30 * 60
+TOKEN_REFRESH_MARGIN = 5 * 60
+# Tokens with an expiry are kept here between CLI runs (mode 0600)
+DEFAULT_TOKEN_CACHE = Path.home() / '.cache' / 'corbin' / 'vertex_token.json'
+# Discovery Engine caps pageSize at 100; larger requests are paginated
+MAX_PAGE_SIZE = 100
+DEFAULT_CONCURRENCY = 4
+
+
+class TranscriptSearchError(Exception):
+    """The search endpoint answered with a non-2xx status"""
+
+    def __init__(self, status: int, body: str):
+        super().__init__(f"HTTP {status}: {body[:500]}")
+        self.status = status
+        self.body = body
+
+
+class GcloudTokenSource:
+    """Access tokens from `gcloud auth print-access-token`"""
+
+    def fetch(self) -> Tuple[str, Optional[float]]:
+        result = subprocess.run(
+            ['gcloud', 'auth', 'print-access-token'],
+            capture_output=True,
+            text=True,
+            check=True
+        )
+        return result.stdout.strip(), time.time() + GCLOUD_TOKEN_LIFETIME
+
+
+class ADCTokenSource:
+    """Access tokens from Application Default Credentials (needs google-auth)"""
+
+    def __init__(self):
+        import google.auth
+        from google.auth.transport.requests import Request
+        self._credentials, _ = google.auth.default(scopes=[CLOUD_PLATFORM_SCOPE])
+        self._request = Request()
+
+    def fetch(self) -> Tuple[str, Optional[float]]:
+        self._credentials.refresh(self._request)
+        expiry = self._credentials.expiry
+        # google-auth reports expiry as a naive UTC datetime
+        if expiry is not None:
+            expiry = expiry.replace(tzinfo=timezone.utc).timestamp()
+        return self._credentials.token, expiry
+
+
+class StaticTokenSource:
+    """A token read from a file, re-read whenever the file changes"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._mtime = None
+
+    def fetch(self) -> Tuple[str, Optional[float]]:
+        with open(self.path) as f:
+            token = f.read().strip()
+        self._mtime = os.path.getmtime(self.path)
+        return token, None
+
+    def changed(self) -> bool:
+        try:
+            return os.path.getmtime(self.path) != self._mtime
+        except OSError:
+            return True
+
+
+TOKEN_SOURCES = {
+    'gcloud': GcloudTokenSource,
+    'adc': ADCTokenSource,
+}
+
+
+def make_token_source(name: str = 'gcloud', token_file: Optional[str] = None):
+    """Build a token source by name: gcloud, adc or file"""
+    if name == 'file':
+        if not token_file:
+            raise ValueError("token source 'file' needs a token file path")
+        return StaticTokenSource(token_file)
+    return TOKEN_SOURCES[name]()
+
+
+class TokenCache:
+    """Caches an access token until shortly before it expires
+
+    With ``path``, tokens that have an expiry are also saved to that file
+    (readable only by the user), so later processes skip the fetch.
+    """
+
+    def __init__(self, source, refresh_margin: float = TOKEN_REFRESH_MARGIN,
+                 path=None):
+        self.source = source
+        self.refresh_margin = refresh_margin
+        self.path = Path(path) if path else None
+        self._token = None
+        self._expiry = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return
+        if (isinstance(saved, dict) and saved.get('source') == type(self.source).__name__
+                and saved.get('token') and isinstance(saved.get('expiry'), (int, float))):
+            self._token, self._expiry = saved['token'], saved['expiry']
+
+    def _save(self):
+        self.path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            json.dump({
+                'source': type(self.source).__name__,
+                'token': self._token,
+                'expiry': self._expiry,
+            }, f)
+        os.replace(tmp, self.path)
+
+    def _stale(self) -> bool:
+        if self._token is None:
+            return True
+        if self._expiry is not None:
+            return time.time() >= self._expiry - self.refresh_margin
+        changed = getattr(self.source, 'changed', None)
+        return bool(changed and changed())
+
+    def token(self) -> str:
+        with self._lock:
+            if self._token is None and self.path:
+                self._load()
+            if self._stale():
+                with metrics.span('auth.token'):
+                    self._token, self._expiry = self.source.fetch()
+                if self.path and self._expiry is not None:
+                    try:
+                        self._save()
+                    except OSError:
+                        # Only a later process's speed-up is lost
+                        pass
+            return self._token
+
+    def invalidate(self):
+        with self._lock:
+            self._token = None
+            if self.path:
+                try:
+                    self.path.unlink()
+                except OSError:
+                    pass
 
-def get_access_token() -> str:
-    """Get Google Cloud access token using gcloud CLI"""
-    result = subprocess.run(
-        ['gcloud', 'auth', 'print-access-token'],
-        capture_output=True,
-        text=True,
-        check=True
+
+class HTTPSession:
+    """Keep-alive HTTP(S) connections pooled per host, safe to share across threads"""
+
+    def __init__(self, timeout: float = 30.0, max_idle: int = 8):
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self._pools: Dict[Tuple[str, str, Optional[int]], queue.LifoQueue] = {}
+        self._lock = threading.Lock()
+
+    def _pool(self, key) -> queue.LifoQueue:
+        with self._lock:
+            return self._pools.setdefault(key, queue.LifoQueue(self.max_idle))
+
+    def _connect(self, scheme: str, host: str, port: Optional[int]):
+        if scheme == 'https':
+            conn = http.client.HTTPSConnection(host, port, timeout=self.timeout)
+        else:
+            conn = http.client.HTTPConnection(host, port, timeout=self.timeout)
+        with metrics.span('http.connect'):
+            conn.connect()
+        # http.client writes headers and body separately; without this, Nagle
+        # plus delayed ACKs stall every request on a reused connection ~40ms
+        conn.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return conn
+
+    def request(self, method: str, url: str, body: Optional[bytes] = None,
+                headers: Optional[Dict[str, str]] = None) -> Tuple[int, bytes]:
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port)
+        path = parts.path + (f"?{parts.query}" if parts.query else "")
+        pool = self._pool(key)
+
+        for attempt in range(2):
+            try:
+                conn = pool.get_nowait()
+                reused = True
+            except queue.Empty:
+                conn = self._connect(*key)
+                reused = False
+            try:
+                conn.request(method, path, body=body, headers=headers or {})
+                response = conn.getresponse()
+                data = response.read()
+            except (http.client.RemoteDisconnected, ConnectionError,
+                    http.client.BadStatusLine):
+                conn.close()
+                # A pooled connection the server already closed; retry on a fresh one
+                if reused and attempt == 0:
+                    continue
+                raise
+            except Exception:
+                conn.close()
+                raise
+            if response.will_close:
+                conn.close()
+            else:
+                try:
+                    pool.put_nowait(conn)
+                except queue.Full:
+                    conn.close()
+            return response.status, data
+
+    def close(self):
+        with self._lock:
+            pools, self._pools = self._pools, {}
+        for pool in pools.values():
+            while not pool.empty():
+                pool.get_nowait().close()
+
+
+class TranscriptSearchClient:
+    """Vertex AI Search client reusing one token cache and connection pool"""
+
+    def __init__(self, project_id: Optional[str] = None,
+                 engine_id: Optional[str] = None, token_source=None,
+                 endpoint: Optional[str] = None, timeout: float = 30.0,
+                 cache: Optional[ResultCache] = None, token_cache_path=None):
+        self.project_id = project_id or os.environ.get("VERTEX_PROJECT_ID", "YOUR_PROJECT_ID")
+        self.engine_id = engine_id or os.environ.get("VERTEX_ENGINE_ID", "YOUR_ENGINE_ID")
+        endpoint = endpoint or os.environ.get("VERTEX_SEARCH_ENDPOINT", DEFAULT_ENDPOINT)
+        self.url = endpoint.rstrip('/') + SEARCH_PATH.format(
+            project_id=self.project_id, engine_id=self.engine_id
+        )
+        self.tokens = TokenCache(token_source or GcloudTokenSource(), path=token_cache_path)
+        self.session = HTTPSession(timeout=timeout)
+        self.cache = cache
+        self.last_latency = 0.0
+        self._refresher = None
+        self._refresher_lock = threading.Lock()
+
+    def close(self):
+        # Let stale-while-revalidate refreshes land before the process exits
+        if self._refresher is not None:
+            self._refresher.shutdown(wait=True)
+        if self.cache is not None:
+            self.cache.close()
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def build_payload(self, query: str, page_size: int = 10) -> Dict:
+        return {
+            "query": query,
+            "pageSize": page_size,
+            "queryExpansionSpec": {"condition": "AUTO"},
+            "spellCorrectionSpec": {"mode": "AUTO"},
+            "languageCode": "en-US",
+            "contentSearchSpec": {
+                "extractiveContentSpec": {"maxExtractiveAnswerCount": 1}
+            },
+            "userInfo": {"timeZone": os.environ.get("USER_TIMEZONE", "UTC")}
+        }
+
+    def post(self, payload: Dict) -> Dict:
+        """POST a search request, refreshing the token once on a 401"""
+        body = json.dumps(payload).encode('utf-8')
+        for attempt in range(2):
+            headers = {
+                'Authorization': f'Bearer {self.tokens.token()}',
+                'Content-Type': 'application/json',
+            }
+            with metrics.span('http.request'):
+                status, data = self.session.request('POST', self.url, body, headers)
+            if status == 401 and attempt == 0:
+                self.tokens.invalidate()
+                continue
+            break
+        if not 200 <= status < 300:
+            raise TranscriptSearchError(status, data.decode('utf-8', 'replace'))
+        with metrics.span('json.decode'):
+            return json.loads(data)
+
+    def search(self, query: str, page_size: int = 10, refresh: bool = False) -> Dict:
+        """Search call transcripts using Vertex AI Search API
+
+        With a cache attached, fresh entries are served locally and stale ones
+        are served immediately while a background refresh replaces them.
+        ``refresh`` skips the cache lookup but still stores the new response.
+        """
+        started = time.perf_counter()
+        if self.cache is None:
+            response = self._search(query, page_size)
+        else:
+            key = ResultCache.make_key(
+                query, page_size, self.url,
+                self.build_payload(query, page_size)['contentSearchSpec']
+            )
+            response, state = None, None
+            if not refresh:
+                with metrics.span('cache.get'):
+                    response, state = self.cache.get(key)
+            if response is None:
+                response = self._search(query, page_size)
+                with metrics.span('cache.put'):
+                    self.cache.put(key, query, response)
+            elif state == STALE and self.cache.claim_refresh(key):
+                self._revalidate(key, query, page_size)
+        self.last_latency = time.perf_counter() - started
+        metrics.record('search', self.last_latency)
+        return response
+
+    def _revalidate(self, key: str, query: str, page_size: int):
+        def refresh():
+            try:
+                self.cache.put(key, query, self._search(query, page_size))
+            except Exception:
+                # The stale entry stays; the lease expires and a later hit retries
+                pass
+
+        with self._refresher_lock:
+            if self._refresher is None:
+                self._refresher = ThreadPoolExecutor(max_workers=1)
+        self._refresher.submit(refresh)
+
+    def _search(self, query: str, page_size: int) -> Dict:
+        """Run the search against the API, following nextPageToken until
+        ``page_size`` results are collected; every page request repeats the
+        same payload, as the API requires.
+        """
+        payload = self.build_payload(query, min(page_size, MAX_PAGE_SIZE))
+        first = response = self.post(payload)
+        results = list(first.get('results', []))
+
+        while len(results) < page_size and response.get('nextPageToken'):
+            payload['pageToken'] = response['nextPageToken']
+            response = self.post(payload)
+            results.extend(response.get('results', []))
+
+        merged = dict(first, results=results[:page_size])
+        merged.pop('nextPageToken', None)
+        if response.get('nextPageToken'):
+            merged['nextPageToken'] = response['nextPageToken']
+        return merged
+
+
+_default_client: Optional[TranscriptSearchClient] = None
+
+
+class FallbackSearcher:
+    """Vertex AI Search first, the local index when the remote call fails"""
+
+    FALLBACK_ERRORS = (
+        OSError, http.client.HTTPException,
+        subprocess.CalledProcessError, TranscriptSearchError,
     )
-    return result.stdout.strip()
+
+    def __init__(self, primary: TranscriptSearchClient, fallback: LocalTranscriptIndex):
+        self.primary = primary
+        self.fallback = fallback
+        self.last_latency = 0.0
+        self._warned = False
+
+    def search(self, query: str, page_size: int = 10, refresh: bool = False) -> Dict:
+        started = time.perf_counter()
+        try:
+            return self.primary.search(query, page_size, refresh)
+        except self.FALLBACK_ERRORS as e:
+            if not self._warned:
+                self._warned = True
+                print(f"Vertex AI Search unavailable ({e}); using local index", file=sys.stderr)
+            metrics.count('search.fallback')
+            return self.fallback.search(query, page_size)
+        finally:
+            self.last_latency = time.perf_counter() - started
+
+    def close(self):
+        self.primary.close()
+        self.fallback.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def get_default_client() -> TranscriptSearchClient:
+    global _default_client
+    if _default_client is None:
+        _default_client = TranscriptSearchClient()
+    return _default_client
+
 
 def search_transcripts(query: str, page_size: int = 10) -> Dict:
     """Search call transcripts using Vertex AI Search API"""
-    import os
-    project_id = os.environ.get("VERTEX_PROJECT_ID", "YOUR_PROJECT_ID")
-    engine_id = os.environ.get("VERTEX_ENGINE_ID", "YOUR_ENGINE_ID")
-    endpoint = (
-        f"https://discoveryengine.googleapis.com/v1alpha/projects/{project_id}/"
-        f"locations/global/collections/default_collection/engines/"
-        f"{engine_id}/servingConfigs/default_search:search"
-    )
-
-    access_token = get_access_token()
-
-    payload = {
-        "query": query,
-        "pageSize": page_size,
-        "queryExpansionSpec": {"condition": "AUTO"},
-        "spellCorrectionSpec": {"mode": "AUTO"},
-        "languageCode": "en-US",
-        "contentSearchSpec": {
-            "extractiveContentSpec": {"maxExtractiveAnswerCount": 1}
-        },
-        "userInfo": {"timeZone": os.environ.get("USER_TIMEZONE", "UTC")}
-    }
-
-    result = subprocess.run(
-        [
-            'curl', '-s', '-X', 'POST',
-            '-H', f'Authorization: Bearer {access_token}',
-            '-H', 'Content-Type: application/json',
-            endpoint,
-            '-d', json.dumps(payload)
-        ],
-        capture_output=True,
-        text=True,
-        check=True
-    )
-
-    return json.loads(result.stdout)
+    return get_default_client().search(query, page_size)
 
 def format_results(response: Dict, verbose: bool = False) -> str:
     """Format search results for display"""
@@ -97,11 +478,180 @@ def format_results(response: Dict, verbose: bool = False) -> str:
 
     return "\n".join(output)
 
+class RateLimiter:
+    """Spaces calls at least 1/rate seconds apart across all threads"""
+
+    def __init__(self, rate: float = 0):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def read_queries(lines: Iterable[str]) -> Iterator[Dict]:
+    """Parse batch input: one plain query or one JSON object per line
+
+    JSON lines need a "query" key and may set "num_results"; any other keys
+    (e.g. an "id") are carried through to the output record. Lines that
+    cannot be used come out as ``{"line": ..., "error": ...}`` records
+    (without a "query") so one bad line doesn't stop the batch.
+    """
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        if line.startswith('{'):
+            try:
+                item = json.loads(line)
+            except ValueError as e:
+                yield {'line': line, 'error': f"Invalid JSON on batch line: {e}"}
+                continue
+            if 'query' not in item:
+                yield {'line': line, 'error': "Batch line has no 'query'"}
+                continue
+        else:
+            item = {'query': line}
+        yield item
+
+
+def run_batch(client, queries: Iterable[Dict],
+              page_size: int = 10, concurrency: int = DEFAULT_CONCURRENCY,
+              rate: float = 0, refresh: bool = False) -> Iterator[Dict]:
+    """Run queries concurrently, yielding result records in completion order
+
+    At most ``2 * concurrency`` queries are read ahead, so input from a pipe
+    is streamed rather than loaded up front.
+    """
+    limiter = RateLimiter(rate)
+
+    def run(item: Dict) -> Dict:
+        limiter.wait()
+        record = dict(item)
+        started = time.perf_counter()
+        try:
+            record['response'] = client.search(
+                item['query'], item.get('num_results', page_size), refresh
+            )
+        except Exception as e:
+            record['error'] = str(e)
+        record['latency_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        return record
+
+    queries = iter(queries)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        in_flight = set()
+        exhausted = False
+        while in_flight or not exhausted:
+            while not exhausted and len(in_flight) < concurrency * 2:
+                item = next(queries, None)
+                if item is None:
+                    exhausted = True
+                elif 'query' not in item:
+                    # An unusable input line; report it without querying
+                    yield item
+                else:
+                    in_flight.add(executor.submit(run, item))
+            if not in_flight:
+                break
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+
+def latency_summary(latencies_ms: List[float], errors: int, elapsed: float) -> str:
+    """One-line aggregate of a batch run"""
+    values = sorted(latencies_ms)
+    count = len(values)
+    rate = count / elapsed if elapsed else 0.0
+    return (
+        f"{count} queries ({errors} errors) in {elapsed:.2f}s, {rate:.1f} queries/sec | "
+        f"latency p50 {percentile(values, 50):.1f}ms, "
+        f"p95 {percentile(values, 95):.1f}ms, p99 {percentile(values, 99):.1f}ms"
+    )
+
+
+def main_batch(client, args) -> None:
+    """Stream batch results to stdout as JSONL, summary to stderr"""
+    source = sys.stdin if args.batch == '-' else open(args.batch)
+    latencies = []
+    errors = 0
+    invalid = 0
+    started = time.perf_counter()
+    try:
+        records = run_batch(
+            client, read_queries(source), args.num_results,
+            args.concurrency, args.rate, args.refresh
+        )
+        for record in records:
+            if 'query' not in record:
+                invalid += 1
+                metrics.count('batch.invalid_lines')
+            else:
+                latencies.append(record['latency_ms'])
+                if 'error' in record:
+                    errors += 1
+                    metrics.count('batch.errors')
+            with metrics.span('output.write'):
+                print(json.dumps(record), flush=True)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+    print(
+        latency_summary(latencies, errors, time.perf_counter() - started),
+        file=sys.stderr
+    )
+    if invalid:
+        print(f"Skipped {invalid} unusable input lines (see their error records)",
+              file=sys.stderr)
+
+
+def make_searcher(args, cache: Optional[ResultCache]):
+    """Build the search backend selected by --backend"""
+    index = LocalTranscriptIndex(args.index_dir)
+    if args.backend == 'local':
+        if not index.exists():
+            raise FileNotFoundError(
+                f"No local index in {index.directory}; build one with --ingest DIR"
+            )
+        return index
+
+    client = TranscriptSearchClient(
+        token_source=make_token_source(args.token_source, args.token_file),
+        endpoint=args.endpoint,
+        cache=cache,
+        token_cache_path=os.environ.get('VERTEX_TOKEN_CACHE', DEFAULT_TOKEN_CACHE)
+    )
+    if args.backend == 'auto' and index.exists():
+        return FallbackSearcher(client, index)
+    return client
+
+
+def print_cache_stats(cache: Optional[ResultCache]) -> None:
+    if cache is None:
+        print("Result cache disabled (--no-cache)", file=sys.stderr)
+        return
+    stats = cache.stats()
+    print(
+        "Cache: " + ", ".join(f"{name} {value}" for name, value in stats.items())
+        + f" ({cache.path})",
+        file=sys.stderr
+    )
+
+
 def main():
     parser = argparse.ArgumentParser(
         description='Search call transcripts using Vertex AI Search'
     )
-    parser.add_argument('query', help='Search query')
+    parser.add_argument('query', nargs='?', help='Search query')
     parser.add_argument(
         '-n', '--num-results',
         type=int,
@@ -118,18 +668,136 @@ def main():
         action='store_true',
         help='Output raw JSON response'
     )
+    parser.add_argument(
+        '--token-source',
+        choices=['gcloud', 'adc', 'file'],
+        default=os.environ.get('VERTEX_TOKEN_SOURCE', 'gcloud'),
+        help='Where to get access tokens (default: gcloud)'
+    )
+    parser.add_argument(
+        '--token-file',
+        default=os.environ.get('VERTEX_TOKEN_FILE'),
+        help='Token file for --token-source file'
+    )
+    parser.add_argument(
+        '--endpoint',
+        default=os.environ.get('VERTEX_SEARCH_ENDPOINT', DEFAULT_ENDPOINT),
+        help='API base URL, e.g. a local mock Discovery Engine server'
+    )
+    parser.add_argument(
+        '--timing',
+        action='store_true',
+        help='Print request latency to stderr'
+    )
+    parser.add_argument(
+        '--batch',
+        metavar='FILE',
+        help='Run queries from FILE (- for stdin), one per line or JSONL; '
+             'results stream out as JSONL'
+    )
+    parser.add_argument(
+        '--concurrency',
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help=f'Concurrent queries in batch mode (default: {DEFAULT_CONCURRENCY})'
+    )
+    parser.add_argument(
+        '--rate',
+        type=float,
+        default=0,
+        help='Max queries per second in batch mode (default: unlimited)'
+    )
+
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Bypass the local result cache entirely'
+    )
+    parser.add_argument(
+        '--refresh',
+        action='store_true',
+        help='Ignore cached results but store the fresh response'
+    )
+    parser.add_argument(
+        '--stats',
+        action='store_true',
+        help='Print result cache hit/miss counters to stderr'
+    )
+    parser.add_argument(
+        '--profile',
+        metavar='FILE',
+        help='Write per-stage timings, counters and peak memory to FILE as JSON'
+    )
+
+    parser.add_argument(
+        '--backend',
+        choices=['auto', 'vertex', 'local'],
+        default=os.environ.get('TRANSCRIPT_SEARCH_BACKEND', 'auto'),
+        help='vertex, local index, or auto: vertex with local fallback '
+             'when an index exists (default: auto)'
+    )
+    parser.add_argument(
+        '--index-dir',
+        default=os.environ.get('TRANSCRIPT_INDEX_DIR'),
+        help='Local transcript index directory (default: ~/.cache/corbin/transcript_index)'
+    )
+    parser.add_argument(
+        '--ingest',
+        metavar='DIR',
+        help='Add new or changed transcript files (.txt/.md/.json/.jsonl) '
+             'under DIR to the local index'
+    )
 
     args = parser.parse_args()
+    if not (args.query or args.batch or args.stats or args.ingest):
+        parser.error('a query, --batch, --stats or --ingest is required')
+    if args.profile:
+        metrics.enable()
 
     try:
-        response = search_transcripts(args.query, args.num_results)
+        if args.ingest:
+            with LocalTranscriptIndex(args.index_dir) as index, metrics.span('index.ingest'):
+                summary = index.ingest(args.ingest)
+            print(
+                f"Indexed {summary['documents']} documents from "
+                f"{summary['added_files']} new or changed files "
+                f"({summary['removed_files']} removed, {summary['failed_files']} skipped) "
+                f"into {index.directory}",
+                file=sys.stderr
+            )
+            if not args.query and not args.batch:
+                return
 
-        if args.json:
-            print(json.dumps(response, indent=2))
-        else:
-            print(format_results(response, args.verbose))
+        cache = None if args.no_cache else ResultCache()
+        if not args.query and not args.batch:
+            print_cache_stats(cache)
+            if cache is not None:
+                cache.close()
+            return
+
+        searcher = make_searcher(args, cache)
+        if args.batch:
+            with searcher:
+                main_batch(searcher, args)
+                if args.stats:
+                    print_cache_stats(cache)
+            return
+
+        # Output goes out before close(), which waits for any background
+        # refresh of a stale cache entry
+        with searcher:
+            response = searcher.search(args.query, args.num_results, args.refresh)
+            if args.timing:
+                print(f"Latency: {searcher.last_latency * 1000:.1f}ms", file=sys.stderr)
+            with metrics.span('output.write'):
+                if args.json:
+                    print(json.dumps(response, indent=2), flush=True)
+                else:
+                    print(format_results(response, args.verbose), flush=True)
+            if args.stats:
+                print_cache_stats(cache)
 
-    except subprocess.CalledProcessError as e:
+    except (subprocess.CalledProcessError, TranscriptSearchError) as e:
         print(f"Error: {e}", file=sys.stderr)
         sys.exit(1)
     except json.JSONDecodeError as e:
@@ -138,6 +806,9 @@ def main():
     except Exception as e:
         print(f"Unexpected error: {e}", file=sys.stderr)
         sys.exit(1)
+    finally:
+        if args.profile:
+            metrics.write_report(args.profile)
 
 if __name__ == '__main__':
     main()
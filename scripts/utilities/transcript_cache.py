@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Transcript Search - Local Result Cache
+SQLite-backed cache of Vertex AI Search responses, shared by concurrent processes
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+DEFAULT_CACHE_PATH = Path.home() / '.cache' / 'corbin' / 'transcript_search.sqlite'
+DEFAULT_TTL = 6 * 60 * 60
+# After the TTL, entries are still served for this long while a refresh runs
+DEFAULT_STALE_TTL = 24 * 60 * 60
+DEFAULT_MAX_ENTRIES = 1000
+# How long one process may hold the right to revalidate an entry
+REFRESH_LEASE = 60
+BUSY_TIMEOUT_MS = 5000
+
+FRESH = 'fresh'
+STALE = 'stale'
+
+
+def normalize_query(query: str) -> str:
+    """Casefold and collapse whitespace so near-identical queries share a key"""
+    return re.sub(r'\s+', ' ', query).strip().casefold()
+
+
+class ResultCache:
+    """Search responses keyed on normalized query and request parameters
+
+    Uses WAL mode and a busy timeout so several CLI processes can read and
+    write the same file; each thread gets its own connection.
+    """
+
+    def __init__(self, path=None, ttl: float = DEFAULT_TTL,
+                 stale_ttl: float = DEFAULT_STALE_TTL,
+                 max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = Path(path or os.environ.get('VERTEX_SEARCH_CACHE', DEFAULT_CACHE_PATH))
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = self._conn()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                query TEXT NOT NULL,
+                response TEXT NOT NULL,
+                stored_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                refreshing_until REAL NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS results_last_access ON results (last_access);
+            CREATE TABLE IF NOT EXISTS stats (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            );
+        """)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Autocommit; multi-statement updates use explicit transactions.
+            # Each connection is only used by its own thread, but close()
+            # runs on whichever thread shuts the cache down.
+            conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000,
+                                   isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(f'PRAGMA busy_timeout={BUSY_TIMEOUT_MS}')
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    @staticmethod
+    def make_key(query: str, page_size: int, url: str,
+                 content_search_spec: Dict) -> str:
+        """Keyed on the full search URL, so a local mock never shares entries"""
+        material = json.dumps(
+            [normalize_query(query), page_size, url, content_search_spec],
+            sort_keys=True
+        )
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def _count(self, name: str):
+        self._conn().execute(
+            "INSERT INTO stats (name, value) VALUES (?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (name,)
+        )
+
+    def get(self, key: str) -> Tuple[Optional[Dict], Optional[str]]:
+        """Return (response, FRESH|STALE), or (None, None) on a miss"""
+        conn = self._conn()
+        now = time.time()
+        row = conn.execute(
+            "SELECT response, stored_at FROM results WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or now - row[1] > self.ttl + self.stale_ttl:
+            self._count('misses')
+            return None, None
+        conn.execute("UPDATE results SET last_access = ? WHERE key = ?", (now, key))
+        state = FRESH if now - row[1] <= self.ttl else STALE
+        self._count('hits' if state == FRESH else 'stale_hits')
+        return json.loads(row[0]), state
+
+    def put(self, key: str, query: str, response: Dict):
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO results "
+                "(key, query, response, stored_at, last_access, refreshing_until) "
+                "VALUES (?, ?, ?, ?, ?, 0)",
+                (key, normalize_query(query), json.dumps(response), now, now)
+            )
+            evicted = conn.execute(
+                "DELETE FROM results WHERE key IN ("
+                "SELECT key FROM results ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            ).rowcount
+            if evicted > 0:
+                conn.execute(
+                    "INSERT INTO stats (name, value) VALUES ('evictions', ?) "
+                    "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+                    (evicted,)
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def claim_refresh(self, key: str) -> bool:
+        """Take the revalidation lease for a stale entry; False if another process has it"""
+        now = time.time()
+        claimed = self._conn().execute(
+            "UPDATE results SET refreshing_until = ? "
+            "WHERE key = ? AND refreshing_until < ?",
+            (now + REFRESH_LEASE, key, now)
+        ).rowcount
+        return claimed == 1
+
+    def stats(self) -> Dict[str, int]:
+        conn = self._conn()
+        counters = dict(conn.execute("SELECT name, value FROM stats"))
+        lookups = sum(counters.get(n, 0) for n in ('hits', 'stale_hits', 'misses'))
+        served = counters.get('hits', 0) + counters.get('stale_hits', 0)
+        return {
+            'entries': conn.execute("SELECT COUNT(*) FROM results").fetchone()[0],
+            'hits': counters.get('hits', 0),
+            'stale_hits': counters.get('stale_hits', 0),
+            'misses': counters.get('misses', 0),
+            'evictions': counters.get('evictions', 0),
+            'hit_rate': round(served / lookups, 3) if lookups else 0.0,
+        }
+
+    def close(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
@@ -0,0 +1,427 @@
+#!/usr/bin/env python3
+"""
+Transcript Search - Local Index
+BM25 inverted index over a directory of transcript files, used offline or as a
+low-latency alternative to Vertex AI Search
+"""
+
+import json
+import math
+import mmap
+import os
+import re
+import shutil
+import struct
+import sys
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from metrics import metrics
+
+DEFAULT_INDEX_DIR = Path.home() / '.cache' / 'corbin' / 'transcript_index'
+SUPPORTED_SUFFIXES = {'.txt', '.md', '.json', '.jsonl'}
+TEXT_KEYS = ('text', 'content', 'transcript', 'body')
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Hashed bag-of-words vectors; only built when NumPy is installed
+VECTOR_DIM = 256
+VECTOR_WEIGHT = 0.3
+ANSWER_MAX_CHARS = 300
+SNIPPET_CHARS = 160
+
+# Segment file records (little-endian, fixed width so they can be read via mmap)
+LEXICON_RECORD = struct.Struct('<QHQI')   # term offset, term length, postings offset, df
+POSTING_RECORD = struct.Struct('<II')     # local doc id, term frequency
+DOC_RECORD = struct.Struct('<QII')        # metadata offset, metadata length, token count
+
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+SENTENCE_RE = re.compile(r'(?<=[.!?])\s+')
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_RE.findall(text.lower())
+
+
+def _flatten_text(value) -> str:
+    """Transcript text may be a string or a list of utterances"""
+    if isinstance(value, list):
+        return "\n".join(
+            _flatten_text(item.get('text', '')) if isinstance(item, dict) else str(item)
+            for item in value
+        )
+    return str(value or '')
+
+
+def load_documents(path: Path) -> Iterator[Dict]:
+    """Yield {title, owner, link, text} documents from one transcript file
+
+    Raises ValueError for malformed JSON; items that are not objects are skipped.
+    """
+    if path.suffix in ('.txt', '.md'):
+        yield {
+            'title': path.stem,
+            'owner': '',
+            'link': path.resolve().as_uri(),
+            'text': path.read_text(errors='replace'),
+        }
+        return
+
+    with open(path) as f:
+        if path.suffix == '.jsonl':
+            items = [json.loads(line) for line in f if line.strip()]
+        else:
+            data = json.load(f)
+            items = data if isinstance(data, list) else [data]
+    items = [item for item in items if isinstance(item, dict)]
+
+    for i, item in enumerate(items):
+        text = next((item[k] for k in TEXT_KEYS if k in item), '')
+        yield {
+            'title': item.get('title') or (path.stem if len(items) == 1 else f"{path.stem} #{i + 1}"),
+            'owner': item.get('owner', ''),
+            'link': item.get('link') or path.resolve().as_uri(),
+            'text': _flatten_text(text),
+        }
+
+
+def hashed_vector(tokens: List[str]):
+    """L2-normalized feature-hashed term vector with sublinear tf"""
+    vector = np.zeros(VECTOR_DIM, dtype=np.float32)
+    for token in tokens:
+        vector[zlib.crc32(token.encode('utf-8')) % VECTOR_DIM] += 1.0
+    np.log1p(vector, out=vector)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def write_segment(directory: Path, documents: List[Dict]) -> Tuple[int, int]:
+    """Write one immutable segment; returns (doc count, total tokens)"""
+    directory.mkdir(parents=True)
+    postings: Dict[str, List[Tuple[int, int]]] = {}
+    total_tokens = 0
+    vectors = []
+
+    with open(directory / 'docs.jsonl', 'wb') as meta, open(directory / 'docs.bin', 'wb') as docs:
+        for doc_id, doc in enumerate(documents):
+            tokens = tokenize(doc['title'] + "\n" + doc['text'])
+            total_tokens += len(tokens)
+            counts: Dict[str, int] = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, tf in counts.items():
+                postings.setdefault(token, []).append((doc_id, tf))
+            if np is not None:
+                vectors.append(hashed_vector(tokens))
+
+            line = (json.dumps(doc) + "\n").encode('utf-8')
+            docs.write(DOC_RECORD.pack(meta.tell(), len(line), len(tokens)))
+            meta.write(line)
+
+    with open(directory / 'terms.dat', 'wb') as terms, \
+            open(directory / 'lexicon.bin', 'wb') as lexicon, \
+            open(directory / 'postings.bin', 'wb') as post:
+        for term in sorted(postings):
+            encoded = term.encode('utf-8')
+            lexicon.write(LEXICON_RECORD.pack(terms.tell(), len(encoded), post.tell(), len(postings[term])))
+            terms.write(encoded)
+            for record in postings[term]:
+                post.write(POSTING_RECORD.pack(*record))
+
+    if vectors:
+        np.save(directory / 'vectors.npy', np.stack(vectors))
+
+    return len(documents), total_tokens
+
+
+class Segment:
+    """Read-only view of one segment; every file is memory-mapped, nothing is parsed up front"""
+
+    def __init__(self, directory: Path, deleted: Set[int]):
+        self.directory = directory
+        self.deleted = deleted
+        self._files = []
+        self.terms = self._map('terms.dat')
+        self.lexicon = self._map('lexicon.bin')
+        self.postings = self._map('postings.bin')
+        self.docs = self._map('docs.bin')
+        self.meta = self._map('docs.jsonl')
+        self.term_count = len(self.lexicon) // LEXICON_RECORD.size
+        self.doc_count = len(self.docs) // DOC_RECORD.size
+        self.vectors = None
+        if np is not None and (directory / 'vectors.npy').exists():
+            self.vectors = np.load(directory / 'vectors.npy', mmap_mode='r')
+
+    def _map(self, name: str):
+        path = self.directory / name
+        if path.stat().st_size == 0:
+            return b''
+        f = open(path, 'rb')
+        self._files.append(f)
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        for mapped in (self.terms, self.lexicon, self.postings, self.docs, self.meta):
+            if isinstance(mapped, mmap.mmap):
+                mapped.close()
+        for f in self._files:
+            f.close()
+        self.vectors = None
+
+    def _term_at(self, i: int) -> Tuple[bytes, int, int]:
+        offset, length, post_offset, df = LEXICON_RECORD.unpack_from(self.lexicon, i * LEXICON_RECORD.size)
+        return self.terms[offset:offset + length], post_offset, df
+
+    def lookup(self, term: str) -> Tuple[int, int]:
+        """Binary search the sorted lexicon; returns (postings offset, df) or (0, 0)"""
+        target = term.encode('utf-8')
+        lo, hi = 0, self.term_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            current, post_offset, df = self._term_at(mid)
+            if current < target:
+                lo = mid + 1
+            elif current > target:
+                hi = mid
+            else:
+                return post_offset, df
+        return 0, 0
+
+    def iter_postings(self, post_offset: int, df: int) -> Iterator[Tuple[int, int]]:
+        end = post_offset + df * POSTING_RECORD.size
+        return POSTING_RECORD.iter_unpack(self.postings[post_offset:end])
+
+    def doc_length(self, doc_id: int) -> int:
+        return DOC_RECORD.unpack_from(self.docs, doc_id * DOC_RECORD.size)[2]
+
+    def document(self, doc_id: int) -> Dict:
+        offset, length, _ = DOC_RECORD.unpack_from(self.docs, doc_id * DOC_RECORD.size)
+        return json.loads(self.meta[offset:offset + length])
+
+
+def _best_sentence(text: str, terms: Set[str]) -> str:
+    best, best_score = '', 0
+    for sentence in SENTENCE_RE.split(text):
+        score = len(terms.intersection(tokenize(sentence)))
+        if score > best_score:
+            best, best_score = sentence.strip(), score
+    return best[:ANSWER_MAX_CHARS]
+
+
+def _snippet(text: str, terms: Set[str]) -> str:
+    """A window around the first matching term, matches wrapped in <b> like Vertex snippets"""
+    match = next(
+        (m for m in TOKEN_RE.finditer(text.lower()) if m.group() in terms), None
+    )
+    start = max(0, match.start() - SNIPPET_CHARS // 2) if match else 0
+    window = text[start:start + SNIPPET_CHARS]
+    out, pos = [], 0
+    for m in TOKEN_RE.finditer(window.lower()):
+        if m.group() in terms:
+            out.append(window[pos:m.start()])
+            out.append(f"<b>{window[m.start():m.end()]}</b>")
+            pos = m.end()
+    out.append(window[pos:])
+    return ('...' if start else '') + ''.join(out).replace('\n', ' ') + '...'
+
+
+class LocalTranscriptIndex:
+    """Segmented on-disk index; each ingest adds a segment for new or changed files
+
+    ``search()`` returns the same response shape as Vertex AI Search, so
+    format_results() and the batch/JSON output work unchanged.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = Path(directory or os.environ.get('TRANSCRIPT_INDEX_DIR', DEFAULT_INDEX_DIR))
+        self.manifest = self._load_manifest()
+        self.last_latency = 0.0
+        self._segments: Optional[List[Segment]] = None
+        self._lock = threading.Lock()
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.directory / 'manifest.json'
+
+    def exists(self) -> bool:
+        return self.manifest_path.exists()
+
+    def _load_manifest(self) -> Dict:
+        if self.manifest_path.exists():
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        return {'next_segment': 1, 'segments': {}, 'files': {}, 'deleted': {}}
+
+    def _save_manifest(self):
+        tmp = self.manifest_path.with_suffix('.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(self.manifest, f)
+        os.replace(tmp, self.manifest_path)
+
+    def _open_segments(self) -> List[Segment]:
+        with self._lock:
+            if self._segments is None:
+                self._segments = [
+                    Segment(self.directory / name, set(self.manifest['deleted'].get(name, [])))
+                    for name in self.manifest['segments']
+                ]
+            return self._segments
+
+    def close(self):
+        for segment in self._segments or []:
+            segment.close()
+        self._segments = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def ingest(self, source_dir) -> Dict[str, int]:
+        """Index new and changed files under ``source_dir``; tombstone removed ones"""
+        self.close()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        source_dir = Path(source_dir).resolve()
+        files = self.manifest['files']
+        seen = set()
+        documents, entries = [], []
+        failed = 0
+
+        for path in sorted(source_dir.rglob('*')):
+            if path.suffix not in SUPPORTED_SUFFIXES or not path.is_file():
+                continue
+            key = str(path)
+            seen.add(key)
+            stat = path.stat()
+            entry = files.get(key)
+            if entry and entry['mtime'] == stat.st_mtime and entry['size'] == stat.st_size:
+                continue
+            try:
+                loaded = list(load_documents(path))
+            except (ValueError, OSError) as e:
+                # Leave the manifest alone so the file is retried next time
+                print(f"Skipping {path}: {e}", file=sys.stderr)
+                failed += 1
+                continue
+            if entry:
+                self._tombstone(entry)
+            first = len(documents)
+            documents.extend(loaded)
+            entries.append((key, stat, list(range(first, len(documents)))))
+
+        removed = [key for key in files if key.startswith(str(source_dir) + os.sep) and key not in seen]
+        for key in removed:
+            self._tombstone(files.pop(key))
+
+        name = None
+        if documents:
+            name = f"seg-{self.manifest['next_segment']:06d}"
+            self.manifest['next_segment'] += 1
+            staging = self.directory / (name + '.tmp')
+            shutil.rmtree(staging, ignore_errors=True)
+            doc_count, total_tokens = write_segment(staging, documents)
+            os.replace(staging, self.directory / name)
+            self.manifest['segments'][name] = {'docs': doc_count, 'tokens': total_tokens}
+        # Files with no documents are recorded too, so they aren't re-read every run
+        for key, stat, doc_ids in entries:
+            files[key] = {'mtime': stat.st_mtime, 'size': stat.st_size,
+                          'segment': name if doc_ids else None, 'docs': doc_ids}
+
+        self._drop_empty_segments()
+        self._save_manifest()
+        return {'added_files': len(entries), 'removed_files': len(removed),
+                'failed_files': failed, 'documents': len(documents)}
+
+    def _drop_empty_segments(self):
+        """Delete segments whose documents have all been superseded or removed"""
+        for name, info in list(self.manifest['segments'].items()):
+            if len(set(self.manifest['deleted'].get(name, []))) >= info['docs']:
+                del self.manifest['segments'][name]
+                self.manifest['deleted'].pop(name, None)
+                shutil.rmtree(self.directory / name, ignore_errors=True)
+
+    def _tombstone(self, entry: Dict):
+        if entry['docs']:
+            self.manifest['deleted'].setdefault(entry['segment'], []).extend(entry['docs'])
+
+    def _stats(self) -> Tuple[int, float]:
+        live, tokens = 0, 0
+        for name, info in self.manifest['segments'].items():
+            live += info['docs'] - len(self.manifest['deleted'].get(name, []))
+            tokens += info['tokens']
+        total_docs = sum(info['docs'] for info in self.manifest['segments'].values())
+        avg_length = tokens / total_docs if total_docs else 0.0
+        return live, avg_length
+
+    def search(self, query: str, page_size: int = 10, refresh: bool = False) -> Dict:
+        """BM25 over all segments, blended with vector similarity when NumPy is available"""
+        started = time.perf_counter()
+        try:
+            return self._search(query, page_size)
+        finally:
+            self.last_latency = time.perf_counter() - started
+            metrics.record('index.search', self.last_latency)
+
+    def _search(self, query: str, page_size: int) -> Dict:
+        segments = self._open_segments()
+        terms = set(tokenize(query))
+        live, avg_length = self._stats()
+        if not terms or not live:
+            return {'totalSize': 0, 'results': []}
+
+        lookups = {term: [segment.lookup(term) for segment in segments] for term in terms}
+        scores: Dict[Tuple[int, int], float] = {}
+        for term, per_segment in lookups.items():
+            df = sum(found_df for _, found_df in per_segment)
+            if not df:
+                continue
+            idf = math.log(1 + (live - df + 0.5) / (df + 0.5))
+            for seg_index, (post_offset, seg_df) in enumerate(per_segment):
+                segment = segments[seg_index]
+                for doc_id, tf in segment.iter_postings(post_offset, seg_df):
+                    if doc_id in segment.deleted:
+                        continue
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * segment.doc_length(doc_id) / avg_length)
+                    key = (seg_index, doc_id)
+                    scores[key] = scores.get(key, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+        if np is not None and scores:
+            scores = self._blend_vectors(segments, tokenize(query), scores)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        results = []
+        for (seg_index, doc_id), _ in ranked[:page_size]:
+            doc = segments[seg_index].document(doc_id)
+            results.append({'document': {'derivedStructData': {
+                'title': doc['title'],
+                'owner': doc['owner'],
+                'link': doc['link'],
+                'extractive_answers': [{'content': _best_sentence(doc['text'], terms)}],
+                'snippets': [{'snippet': _snippet(doc['text'], terms)}],
+            }}})
+        return {'totalSize': len(ranked), 'results': results}
+
+    def _blend_vectors(self, segments: List[Segment], query_tokens: List[str],
+                       scores: Dict[Tuple[int, int], float]) -> Dict[Tuple[int, int], float]:
+        """Re-rank BM25 matches with cosine similarity from the vector matrices"""
+        query_vector = hashed_vector(query_tokens)
+        similarities = [
+            segment.vectors @ query_vector if segment.vectors is not None else None
+            for segment in segments
+        ]
+        top = max(scores.values())
+        blended = {}
+        for (seg_index, doc_id), score in scores.items():
+            segment_similarities = similarities[seg_index]
+            similarity = float(segment_similarities[doc_id]) if segment_similarities is not None else 0.0
+            blended[(seg_index, doc_id)] = (1 - VECTOR_WEIGHT) * score / top + VECTOR_WEIGHT * similarity
+        return blended